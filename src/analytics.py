@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from array import array
+import heapq
+
+class PairReport:
+    """
+    Running measurements of who has actually sat with whom across a series of plans:
+    how often each pair were neighbours, how often each student sat in the front row,
+    and how mixed (by gender and by clique) the neighbours along each row were.
+
+    Plans are folded in one at a time by add(), touching only their own seats, so the
+    report for a year of daily plans costs no more to extend than the first week did.
+    Students are keyed by name, so plans of the same class parsed at different times
+    (or of several classes) can share one report.
+    """
+    adjacency: str
+    names: list[str]
+    ids: dict[str, int]
+    counts: dict[tuple[int, int], int]
+    n_plans: int
+
+    def __init__(self: PairReport, adjacency: str='orthogonal'):
+        """
+        adjacency is the SeatIndex kind (or '+'-joined kinds) that counts as sitting together.
+        """
+        self.adjacency = adjacency
+        self.names, self.ids = [], {}
+        self.counts = {}
+        self.n_plans = 0
+
+        # Per student: plans sat in, plans sat in the front row
+        self.present, self.front = array('l'), array('l')
+
+        # Per grid row: neighbouring pairs along it, and how many mixed gender or clique
+        self.row_pairs, self.row_mixed_gender, self.row_mixed_clique = {}, {}, {}
+
+    def get_id(self: PairReport, name: str) -> int:
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.present.append(0)
+            self.front.append(0)
+        return i
+
+    def add(self: PairReport, plan: object):
+        """
+        Fold one SeatingPlan into the report.
+        """
+        index = plan.potential.get_index()
+        neighbours = plan.potential.get_neighbours(self.adjacency)
+        rows, students, empty = index.rows, plan.c.students, plan.EMPTY
+
+        seated = list(None if i == empty else students[i] for i in plan.assignment)
+        ids = list(None if s is None else self.get_id(s.name) for s in seated)
+        front = min(rows, default=0)
+
+        for (seat, x) in enumerate(ids):
+            if x is None:
+                continue
+            self.present[x] += 1
+            if rows[seat] == front:
+                self.front[x] += 1
+
+            row, s = rows[seat], seated[seat]
+            for other in neighbours[seat]:
+                y = ids[other]
+                if other < seat or y is None:
+                    continue
+
+                key = (x, y) if x < y else (y, x)
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+                if rows[other] == row:
+                    t = seated[other]
+                    self.row_pairs[row] = self.row_pairs.get(row, 0) + 1
+                    if s.gender != t.gender:
+                        self.row_mixed_gender[row] = self.row_mixed_gender.get(row, 0) + 1
+                    if not s.clique or s.clique != t.clique:
+                        self.row_mixed_clique[row] = self.row_mixed_clique.get(row, 0) + 1
+
+        self.n_plans += 1
+
+    def add_all(self: PairReport, plans: object) -> PairReport:
+        for plan in plans:
+            self.add(plan)
+        return self
+
+    def get_count(self: PairReport, a: str, b: str) -> int:
+        """
+        Return how many plans sat the two named students together.
+        """
+        x, y = self.ids.get(a), self.ids.get(b)
+        if x is None or y is None:
+            return 0
+        return self.counts.get((x, y) if x < y else (y, x), 0)
+
+    def get_matrix(self: PairReport) -> list[array]:
+        """
+        Return the symmetric co-seating count matrix, one row per student in order of first appearance.
+        """
+        n = len(self.names)
+        matrix = list(array('l', bytes(n * array('l').itemsize)) for _ in range(n))
+        for ((x, y), count) in self.counts.items():
+            matrix[x][y] = matrix[y][x] = count
+        return matrix
+
+    def get_top_pairs(self: PairReport, k: int=10) -> list[tuple[str, str, int]]:
+        """
+        Return the k pairs who have sat together most often, most first.
+        """
+        top = heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+        return list((self.names[x], self.names[y], count) for ((x, y), count) in top)
+
+    def get_front_exposure(self: PairReport) -> dict[str, float]:
+        """
+        Return, for each student, the fraction of their plans spent in the front row.
+        """
+        return {name: self.front[i] / self.present[i] for (i, name) in enumerate(self.names) if self.present[i]}
+
+    def get_row_mixing(self: PairReport) -> dict[int, tuple[float, float]]:
+        """
+        Return, for each grid row, the fraction of neighbouring pairs along it of mixed
+        gender and the fraction not sharing a clique.
+        """
+        return {
+            row: (self.row_mixed_gender.get(row, 0) / n, self.row_mixed_clique.get(row, 0) / n)
+            for (row, n) in sorted(self.row_pairs.items())
+        }
+
+    def get_summary(self: PairReport) -> dict[str, float]:
+        """
+        Return headline numbers: how much of the pair graph has been covered (the fraction
+        of all possible pairs who have sat together at least once) and how often pairs repeat.
+        """
+        n = len(self.names)
+        n_possible = n * (n - 1) // 2
+        n_seen = len(self.counts)
+        total = sum(self.counts.values())
+        return {
+            'plans': self.n_plans,
+            'students': n,
+            'pairs_seen': n_seen,
+            'coverage': n_seen / n_possible if n_possible else 0.0,
+            'max_repeat': max(self.counts.values(), default=0),
+            'mean_repeat': total / n_seen if n_seen else 0.0,
+            'repeated_pairs': sum(1 for count in self.counts.values() if count > 1),
+        }
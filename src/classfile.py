@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+
+SECTIONS = ('names', 'room', 'grid')
+
+# A section header is a word and :: alone on its line; a known one followed by more text is an error
+HEADER = re.compile(r'(\w*)\s*::')
+
+# Bump when the parsed form changes so stale sidecars are ignored
+CACHE_VERSION = 2
+
+class ParseError(ValueError):
+    path: Path|None
+    line_no: int
+
+    def __init__(self: ParseError, path: Path|None, line_no: int, message: str):
+        self.path, self.line_no = path, line_no
+        where = f'{path}:{line_no}' if path else f'line {line_no}'
+        super().__init__(f'{where}: {message}')
+
+class ClassData:
+    """
+    The plain parsed form of a class file: (name, gender, clique) per student, and for
+    each room (started by a room:: section) one grid of booleans per grid:: section.
+    """
+    students: list[tuple[str, str, str]]
+    rooms: list[list[list[tuple[bool, ...]]]]
+
+    def __init__(self: ClassData, students: list[tuple[str, str, str]]=None, rooms: list[list[list[tuple[bool, ...]]]]=None):
+        self.students = students or []
+        self.rooms = rooms or []
+
+    @property
+    def grids(self: ClassData) -> list[list[tuple[bool, ...]]]:
+        return list(grid for room in self.rooms for grid in room)
+
+    def to_json(self: ClassData) -> dict:
+        return {
+            'students': list(list(s) for s in self.students),
+            'rooms': list(
+                list(list(''.join('1' if c else '0' for c in row) for row in grid) for grid in room)
+                for room in self.rooms
+            ),
+        }
+
+    @staticmethod
+    def from_json(d: dict) -> ClassData:
+        students = list(tuple(s) for s in d['students'])
+        rooms = list(list(list(tuple(c == '1' for c in row) for row in grid) for grid in room) for room in d['rooms'])
+        return ClassData(students, rooms)
+
+def tokenize(lines: Iterable[str], path: Path=None, genders: Iterable[str]=None, default_gender: str='') -> Iterator[tuple[int, str, object]]:
+    """
+    Yield (line number, kind, value) tokens from the lines of a class file, one line at a time.
+
+    Kinds are 'section' (the section name), 'name' (a name, gender, clique tuple) and
+    'row' (a tuple of booleans). A header must be alone on its line, so Name::clique is
+    a student with the default gender. Anything malformed raises ParseError.
+    """
+    genders = None if genders is None else set(genders)
+    section = None
+
+    for (line_no, line) in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        header = HEADER.match(line)
+        if header and (header.end() == len(line) or header[1] in SECTIONS):
+            if header[1] not in SECTIONS:
+                raise ParseError(path, line_no, f'Unknown section {header[1]!r}; expected one of {", ".join(SECTIONS)}')
+            if header.end() != len(line):
+                raise ParseError(path, line_no, f'Unexpected {line[header.end():].strip()!r} after {header[1]}::; put it on its own line')
+            section = header[1]
+            yield line_no, 'section', section
+
+        elif section == 'names':
+            name, *parts = (part.strip() for part in line.split(':'))
+            if not name:
+                raise ParseError(path, line_no, 'Missing name')
+            if len(parts) > 2:
+                raise ParseError(path, line_no, f'Expected name[:gender[:clique]], got {line!r}')
+
+            gender = parts[0] if parts and parts[0] else default_gender
+            clique = parts[1] if len(parts) > 1 else ''
+            if genders is not None and gender not in genders:
+                raise ParseError(path, line_no, f'Unknown gender {gender!r} for {name}')
+
+            yield line_no, 'name', (name, gender, clique)
+
+        elif section == 'grid':
+            cells = line.replace(' ', '')
+            bad = set(cells) - {'0', '1'}
+            if bad:
+                raise ParseError(path, line_no, f'Grid rows may only contain 0 and 1, not {"".join(sorted(bad))!r}')
+            yield line_no, 'row', tuple(c == '1' for c in cells)
+
+        else:
+            raise ParseError(path, line_no, 'Expected a names::, room:: or grid:: section first')
+
+def parse(lines: Iterable[str], path: Path=None, genders: Iterable[str]=None, default_gender: str='') -> ClassData:
+    data = ClassData()
+    seen = {}
+    room_lines = []
+    grid, grid_line = None, 0
+    line_no = 0
+
+    def close_grid():
+        if grid is not None and not any(any(row) for row in grid):
+            raise ParseError(path, grid_line, 'Grid has no seats')
+
+    for (line_no, kind, value) in tokenize(lines, path, genders, default_gender):
+        if kind == 'section':
+            close_grid()
+            grid = None
+            if value == 'room':
+                data.rooms.append([])
+                room_lines.append(line_no)
+            elif value == 'grid':
+                grid, grid_line = [], line_no
+                if not data.rooms:
+                    data.rooms.append([])
+                    room_lines.append(line_no)
+                data.rooms[-1].append(grid)
+
+        elif kind == 'name':
+            name = value[0]
+            if name in seen:
+                raise ParseError(path, line_no, f'{name} is already listed on line {seen[name]}')
+            seen[name] = line_no
+            data.students.append(value)
+
+        elif kind == 'row':
+            if grid and len(value) != len(grid[0]):
+                raise ParseError(path, line_no, f'Grid row has {len(value)} columns; the rows above have {len(grid[0])}')
+            grid.append(value)
+
+    close_grid()
+    if not data.grids:
+        raise ParseError(path, line_no, 'No grid:: section')
+    for (room, room_line) in zip(data.rooms, room_lines):
+        if not room:
+            raise ParseError(path, room_line, 'Every room:: needs at least one grid:: section')
+    return data
+
+def get_cache_path(path: Path) -> Path:
+    return path.with_name(f'.{path.name}.cache.json')
+
+def load(path: Path, genders: Iterable[str]=None, default_gender: str='', use_cache: bool=True) -> ClassData:
+    """
+    Parse a class file, reusing the sidecar cache beside it if the file is unchanged.
+
+    The cache is trusted outright when the file's mtime and size match; otherwise the
+    file is hashed and the cache is reused only if the content hash still matches.
+    """
+    path = Path(path)
+    if not use_cache:
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse(f, path, genders, default_gender)
+
+    stat = os.stat(path)
+    cache_path = get_cache_path(path)
+
+    cached = None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('version') != CACHE_VERSION:
+            cached = None
+    except (OSError, ValueError):
+        pass
+
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        return ClassData.from_json(cached)
+
+    # Hash and then parse in two streaming passes, so a big file is never held in memory whole
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 16):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    if cached and cached['sha1'] == digest:
+        data = ClassData.from_json(cached)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = parse(f, path, genders, default_gender)
+
+    entry = {'version': CACHE_VERSION, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': digest}
+    entry.update(data.to_json())
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+    except OSError:
+        # A read-only class folder just means no cache
+        pass
+
+    return data
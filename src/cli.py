@@ -0,0 +1,10 @@
+"""
+Command-line entry point: python src/cli.py [options], as for seating.py.
+
+A script run directly is compiled afresh every time, while an imported module is loaded
+from its cached bytecode, so this stays tiny and leaves the work to seating.
+"""
+import seating
+
+if __name__ == '__main__':
+    seating.SeatingPlanner.main()
@@ -0,0 +1,487 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations, repeat
+from math import comb, factorial, sqrt
+from operator import add, itemgetter
+from statistics import NormalDist
+from typing import Iterable
+import random
+
+# Largest number of students touching a forbidden pair that the bitmask DP will take on
+BITMASK_LIMIT = 12
+
+# Largest line the brute-force oracle will enumerate
+BRUTE_LIMIT = 13
+
+# Monte Carlo defaults: samples per batch, and the widest acceptable confidence half-width
+DEFAULT_BATCH_SIZE = 20000
+DEFAULT_TOLERANCE = 0.005
+DEFAULT_MAX_SAMPLES = 5_000_000
+
+def normalise_pairs(pairs: Iterable[Iterable[int]]) -> set[frozenset[int]]:
+    """
+    Return the given pairs as a set of 2-element frozensets, dropping self-pairs.
+    """
+    normalised = set()
+    for pair in pairs:
+        pair = frozenset(pair)
+        if len(pair) == 2:
+            normalised.add(pair)
+    return normalised
+
+def chain_pairs(n: int) -> set[frozenset[int]]:
+    """
+    Return the pairs of a previous line arrangement 0, 1, ..., n - 1.
+    """
+    return set(frozenset({i, i + 1}) for i in range(n - 1))
+
+def pairs_from_plan(plan: object, adjacency: str='orthogonal') -> set[frozenset[int]]:
+    """
+    Return the neighbour pairs (of the given adjacency kind) of a previous SeatingPlan
+    as indices into its class's students. These need not form paths: orthogonal
+    neighbours of a grid form a grid graph, which count_avoiding handles as well.
+    """
+    return set(frozenset(s.id for s in pair) for pair in plan.get_neighbour_pairs(adjacency))
+
+def count_repeats_brute(n: int, pairs: Iterable[Iterable[int]], workers: int=None) -> int:
+    """
+    Reference oracle: walk every line arrangement of range(n) and count those that
+    put at least one forbidden pair side by side.
+
+    The arrangements are split into shards by their first two students, each walked
+    lazily so memory stays flat, and with workers the shards run in worker processes.
+    Around n = 10 takes seconds on one core; n = BRUTE_LIMIT takes hours even on many.
+    """
+    if n > BRUTE_LIMIT:
+        raise ValueError(f'Enumerating {n}! arrangements is out of reach; the limit is {BRUTE_LIMIT}')
+    if n < 2:
+        return 0
+
+    forbidden = bytearray(n * n)
+    for pair in normalise_pairs(pairs):
+        a, b = pair
+        if not (0 <= a < n and 0 <= b < n):
+            raise ValueError(f'Pair {sorted(pair)} is out of range for {n} students')
+        forbidden[a * n + b] = forbidden[b * n + a] = 1
+
+    prefixes = list((a, b) for a in range(n) for b in range(n) if a != b)
+    if not workers:
+        return sum(_count_repeats_shard(n, forbidden, prefix) for prefix in prefixes)
+
+    with ProcessPoolExecutor(workers) as pool:
+        return sum(pool.map(_count_repeats_shard, repeat(n), repeat(forbidden), prefixes))
+
+def _count_repeats_shard(n: int, forbidden: bytearray, prefix: tuple[int, int]) -> int:
+    """
+    Count the repeating arrangements that start with the two students in prefix. Each
+    arrangement is checked with C-level map/any passes over a flat pair table.
+    """
+    a, b = prefix
+    rest = list(i for i in range(n) if i not in prefix)
+    if forbidden[a * n + b]:
+        return factorial(len(rest))
+    if not rest:
+        return 0
+
+    scale = list(x * n for x in range(n)).__getitem__
+    is_forbidden = forbidden.__getitem__
+    head = b * n
+
+    hits = 0
+    for p in permutations(rest):
+        if forbidden[head + p[0]] or any(map(is_forbidden, map(add, map(scale, p), p[1:]))):
+            hits += 1
+    return hits
+
+def count_repeats(n: int, pairs: Iterable[Iterable[int]]) -> int:
+    """
+    Return how many of the n! line arrangements put at least one forbidden pair side by side.
+    """
+    return factorial(n) - count_avoiding(n, pairs)
+
+def repeat_probability(n: int, pairs: Iterable[Iterable[int]]) -> float:
+    """
+    Return the chance that a uniformly random line arrangement repeats a forbidden pair.
+    """
+    return count_repeats(n, pairs) / factorial(n)
+
+def count_avoiding(n: int, pairs: Iterable[Iterable[int]]) -> int:
+    """
+    Return how many line arrangements of range(n) keep every forbidden pair apart.
+
+    Pairs from a previous line, or from the rows of a grid, form disjoint paths, which
+    have a closed form. A few students in any other pattern go to a bitmask DP over the
+    students that appear in a forbidden pair. Anything bigger, such as a previous plan's
+    orthogonal neighbours, which form a grid graph, is counted by inclusion-exclusion over
+    the linear forests of the pair graph; see _get_forest_polynomial.
+    """
+    pairs = normalise_pairs(pairs)
+    for pair in pairs:
+        if not all(0 <= i < n for i in pair):
+            raise ValueError(f'Pair {sorted(pair)} is out of range for {n} students')
+
+    paths = _get_path_lengths(pairs)
+    if paths is not None:
+        return _count_avoiding_paths(n, paths)
+    if len(set(i for pair in pairs for i in pair)) <= BITMASK_LIMIT:
+        return _count_avoiding_bitmask(n, pairs)
+    return _count_avoiding_forests(n, pairs)
+
+def _get_path_lengths(pairs: set[frozenset[int]]) -> list[int]|None:
+    """
+    Return the number of edges in each component if the pairs form disjoint paths, else None.
+    """
+    adjacent = {}
+    for pair in pairs:
+        a, b = pair
+        adjacent.setdefault(a, []).append(b)
+        adjacent.setdefault(b, []).append(a)
+
+    if any(len(others) > 2 for others in adjacent.values()):
+        return None
+
+    lengths = []
+    seen = set()
+    for start in adjacent:
+        if start in seen:
+            continue
+
+        # Walk the whole component, counting vertices and edge ends
+        stack = [start]
+        seen.add(start)
+        n_vertices, n_ends = 0, 0
+        while stack:
+            v = stack.pop()
+            n_vertices += 1
+            n_ends += len(adjacent[v])
+            for w in adjacent[v]:
+                if w not in seen:
+                    seen.add(w)
+                    stack.append(w)
+
+        n_edges = n_ends // 2
+
+        # A cycle has as many edges as vertices
+        if n_edges != n_vertices - 1:
+            return None
+
+        lengths.append(n_edges)
+
+    return lengths
+
+def _count_avoiding_paths(n: int, paths: list[int]) -> int:
+    """
+    Inclusion-exclusion over subsets of forbidden pairs. Choosing k pairs that make c runs
+    glues n people into n - k blocks, c of which can face either way: (n - k)! * 2^c.
+    Each path contributes a polynomial in k, and the polynomials multiply.
+    """
+    poly = [1]
+    for m in paths:
+        path_poly = [1]
+        for k in range(1, m + 1):
+            path_poly.append(sum(comb(k - 1, c - 1) * comb(m - k + 1, c) * 2 ** c for c in range(1, k + 1)))
+
+        poly = _multiply(poly, path_poly)
+
+    return sum((-1) ** k * a * factorial(n - k) for (k, a) in enumerate(poly))
+
+def _multiply(p: list[int], q: list[int]) -> list[int]:
+    product = [0] * (len(p) + len(q) - 1)
+    for (i, a) in enumerate(p):
+        for (j, b) in enumerate(q):
+            product[i + j] += a * b
+    return product
+
+def _count_avoiding_forests(n: int, pairs: set[frozenset[int]]) -> int:
+    """
+    The same inclusion-exclusion as _count_avoiding_paths for any pair graph: the k chosen
+    pairs must form disjoint paths (a linear forest) to glue into blocks, and each
+    connected component of the graph contributes its own polynomial in k.
+    """
+    adjacent = {}
+    for pair in pairs:
+        a, b = pair
+        adjacent.setdefault(a, []).append(b)
+        adjacent.setdefault(b, []).append(a)
+
+    poly = [1]
+    seen = set()
+    for start in sorted(adjacent):
+        if start in seen:
+            continue
+
+        # Breadth-first order keeps the frontier of the component narrow
+        order = [start]
+        seen.add(start)
+        for v in order:
+            for w in sorted(adjacent[v]):
+                if w not in seen:
+                    seen.add(w)
+                    order.append(w)
+
+        position = {v: i for (i, v) in enumerate(order)}
+        edges = sorted(
+            (tuple(sorted((position[a], position[b]))) for pair in pairs for (a, b) in [tuple(pair)] if a in position),
+            key=lambda e: (e[1], e[0]),
+        )
+        poly = _multiply(poly, _get_forest_polynomial(edges))
+
+    return sum((-1) ** k * a * factorial(n - k) for (k, a) in enumerate(poly))
+
+def _get_forest_polynomial(edges: list[tuple[int, int]]) -> list[int]:
+    """
+    Return a[k], the sum over every set of k edges that forms disjoint paths of 2 to the
+    power of its number of paths, for one connected graph.
+
+    Edges are taken one at a time, keeping a frontier of the vertices with edges still
+    to come. A state gives each frontier vertex its degree so far and, if it ends a path,
+    the vertex at the path's other end (CLOSED once that has left the frontier), which is
+    all that is needed to refuse a third edge at a vertex or an edge closing a cycle. Each
+    state holds a polynomial counting its edge sets by size, weighted by 2 for every vertex
+    touched; a forest with k edges touching t vertices has t - k paths, so a[k] is that
+    weight over 2^k.
+    """
+    CLOSED = -1
+    last = {}
+    for (e, (u, v)) in enumerate(edges):
+        last[u] = last[v] = e
+
+    states = {(): [1]}
+    for (e, (u, v)) in enumerate(edges):
+        new_states = {}
+
+        def add(frontier: dict[int, tuple[int, int]], poly: list[int]):
+            # Vertices with no edges to come leave the frontier, closing any path they end
+            for w in (u, v):
+                if last[w] == e:
+                    deg, mate = frontier.pop(w)
+                    if deg == 1 and mate != CLOSED:
+                        frontier[mate] = (frontier[mate][0], CLOSED)
+                    if deg:
+                        poly = list(2 * a for a in poly)
+
+            key = tuple(sorted(frontier.items()))
+            old = new_states.get(key)
+            if old is None:
+                new_states[key] = poly
+            else:
+                if len(old) < len(poly):
+                    old.extend([0] * (len(poly) - len(old)))
+                for (k, a) in enumerate(poly):
+                    old[k] += a
+
+        for (key, poly) in states.items():
+            frontier = dict(key)
+            frontier.setdefault(u, (0, u))
+            frontier.setdefault(v, (0, v))
+
+            # Leave the edge out
+            add(dict(frontier), poly)
+
+            # Take it, unless a vertex is full or it would join a path's two ends
+            (du, mu), (dv, mv) = frontier[u], frontier[v]
+            if du < 2 and dv < 2 and mu != v:
+                end_u, end_v = (u if du == 0 else mu), (v if dv == 0 else mv)
+                frontier[u], frontier[v] = (du + 1, u), (dv + 1, v)
+                for (end, other) in ((end_u, end_v), (end_v, end_u)):
+                    if end != CLOSED and frontier[end][0] < 2:
+                        frontier[end] = (frontier[end][0], other)
+                add(frontier, [0] + poly)
+
+        states = new_states
+
+    (poly,) = states.values()
+    return list(a >> k for (k, a) in enumerate(poly))
+
+def _count_avoiding_bitmask(n: int, pairs: set[frozenset[int]]) -> int:
+    """
+    Arrange the students that touch a forbidden pair as ordered runs with no forbidden pair
+    inside a run, then drop the runs into distinct gaps between the free students.
+    """
+    constrained = sorted(set(i for pair in pairs for i in pair))
+    k = len(constrained)
+    if k > BITMASK_LIMIT:
+        raise ValueError(f'{k} students share forbidden pairs that are not simple paths; the limit is {BITMASK_LIMIT}')
+
+    allowed = [0] * k
+    for i in range(k):
+        for j in range(k):
+            if i != j and frozenset({constrained[i], constrained[j]}) not in pairs:
+                allowed[i] |= 1 << j
+
+    # ways[mask][last] is a list indexed by number of runs
+    full = (1 << k) - 1
+    ways = [None] * (1 << k)
+    for i in range(k):
+        counts = [0] * (k + 1)
+        counts[1] = 1
+        ways[1 << i] = {i: counts}
+
+    for mask in range(1, full + 1):
+        if ways[mask] is None:
+            continue
+
+        for (last, counts) in ways[mask].items():
+            for v in range(k):
+                bit = 1 << v
+                if mask & bit:
+                    continue
+
+                target = ways[mask | bit]
+                if target is None:
+                    target = ways[mask | bit] = {}
+                if v not in target:
+                    target[v] = [0] * (k + 1)
+                new = target[v]
+
+                joins = allowed[last] & bit
+                for b in range(1, k):
+                    if counts[b]:
+                        new[b + 1] += counts[b]
+                        if joins:
+                            new[b] += counts[b]
+                if joins and counts[k]:
+                    new[k] += counts[k]
+
+        if mask != full:
+            ways[mask] = None
+
+    free = n - k
+    by_runs = [0] * (k + 1)
+    for counts in (ways[full] or {}).values():
+        for (b, c) in enumerate(counts):
+            by_runs[b] += c
+
+    if k == 0:
+        return factorial(n)
+
+    return sum(c * comb(free + 1, b) for (b, c) in enumerate(by_runs)) * factorial(free)
+
+class Estimate:
+    """
+    A sampled probability with its confidence interval.
+    """
+    hits: int
+    n: int
+    low: float
+    high: float
+    confidence: float
+
+    def __init__(self: Estimate, hits: int, n: int, confidence: float):
+        self.hits, self.n, self.confidence = hits, n, confidence
+        self.low, self.high = wilson_interval(hits, n, confidence)
+
+    @property
+    def p(self: Estimate) -> float:
+        return self.hits / self.n if self.n else 0.0
+
+    @property
+    def half_width(self: Estimate) -> float:
+        return (self.high - self.low) / 2
+
+    def __repr__(self: Estimate) -> str:
+        return f'{self.p:.4f} [{self.low:.4f}, {self.high:.4f}] from {self.n} samples'
+
+def wilson_interval(hits: int, n: int, confidence: float) -> tuple[float, float]:
+    """
+    Return the Wilson score interval for a binomial proportion.
+    """
+    if not n:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = hits / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    spread = z * sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+def get_layout_pairs(neighbours: list[Iterable[int]], n_students: int) -> set[frozenset[int]]:
+    """
+    Return the neighbour pairs of the plan that seats student i in seat i, which stands in
+    for any previous plan: relabelling students does not change the repeat probability.
+    """
+    return set(
+        frozenset({a, b})
+        for a in range(n_students) for b in neighbours[a]
+        if b < n_students and a != b
+    )
+
+def sample_repeats(neighbours: list[Iterable[int]], n_students: int, pairs: Iterable[Iterable[int]], n: int, seed: int|None) -> int:
+    """
+    Draw n uniform plans and return how many seat at least one forbidden pair side by side.
+
+    The forbidden pairs become a flat boolean table and each plan is checked with
+    C-level map/any passes over the layout's edge list, stopping at the first repeat.
+    """
+    n_seats = len(neighbours)
+    m = n_students + 1
+    edges = list((a, b) for a in range(n_seats) for b in neighbours[a] if b > a)
+    if not edges:
+        return 0
+
+    forbidden = bytearray(m * m)
+    for pair in normalise_pairs(pairs):
+        a, b = pair
+        forbidden[a * m + b] = forbidden[b * m + a] = 1
+
+    # Pad to two edges so that itemgetter always returns tuples
+    ends_a = list(a for (a, _) in edges) * (2 if len(edges) == 1 else 1)
+    ends_b = list(b for (_, b) in edges) * (2 if len(edges) == 1 else 1)
+    get_a, get_b = itemgetter(*ends_a), itemgetter(*ends_b)
+    scale = list(x * m for x in range(m)).__getitem__
+    is_forbidden = forbidden.__getitem__
+
+    rng = random.Random(seed)
+    shuffle = rng.shuffle
+    occupant = list(range(n_students)) + [n_students] * (n_seats - n_students)
+
+    hits = 0
+    for _ in range(n):
+        shuffle(occupant)
+        if any(map(is_forbidden, map(add, map(scale, get_a(occupant)), get_b(occupant)))):
+            hits += 1
+    return hits
+
+def estimate_repeat_probability(neighbours: list[Iterable[int]], n_students: int, pairs: Iterable[Iterable[int]]=None,
+                                tolerance: float=DEFAULT_TOLERANCE, confidence: float=0.95,
+                                batch_size: int=DEFAULT_BATCH_SIZE, max_samples: int=DEFAULT_MAX_SAMPLES,
+                                seed: int=None, workers: int=None) -> Estimate:
+    """
+    Estimate the chance that a random plan on a layout repeats one of the given neighbour
+    pairs (by default, those of a previous plan on the same layout).
+
+    neighbours is a layout's per-seat neighbour lists, e.g. PotentialLayout.get_neighbours().
+    Batches are sampled until the confidence interval's half-width is within tolerance or
+    max_samples is reached. With workers, each round runs one batch per worker process.
+    """
+    neighbours = list(tuple(others) for others in neighbours)
+    if n_students > len(neighbours):
+        raise ValueError(f'{n_students} students do not fit in {len(neighbours)} seats')
+    pairs = get_layout_pairs(neighbours, n_students) if pairs is None else normalise_pairs(pairs)
+
+    seeds = random.Random(seed)
+    hits, n = 0, 0
+    estimate = Estimate(0, 0, confidence)
+
+    pool = ProcessPoolExecutor(workers) if workers else None
+    try:
+        while n < max_samples and estimate.half_width > tolerance:
+            size = min(batch_size, max_samples - n)
+
+            if pool:
+                futures = list(
+                    pool.submit(sample_repeats, neighbours, n_students, pairs, size, seeds.getrandbits(64))
+                    for _ in range(workers)
+                )
+                hits += sum(f.result() for f in futures)
+                n += size * workers
+            else:
+                hits += sample_repeats(neighbours, n_students, pairs, size, seeds.getrandbits(64))
+                n += size
+
+            estimate = Estimate(hits, n, confidence)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return estimate
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from pathlib import Path
+import datetime
+
+PATH_HISTORY = Path('src/history')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    score REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS placements (
+    plan_id INTEGER NOT NULL REFERENCES plans(id),
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (plan_id, row, col)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pair_counts (
+    a TEXT NOT NULL,
+    b TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_plan INTEGER NOT NULL,
+    PRIMARY KEY (a, b)
+) WITHOUT ROWID;
+"""
+
+class HistoryStore:
+    """
+    Append-only record of the plans accepted for one class, with a running count of
+    how often each pair of students has sat together.
+
+    The pair counts live in their own table, updated as each plan is recorded, and are
+    mirrored in memory on open so that lookups never touch the plan log. Sitting together
+    means being neighbours of the store's adjacency kind, fixed when the store is created,
+    so counts taken under different adjacencies are never mixed.
+    """
+    path: Path
+    adjacency: str
+    counts: dict[tuple[str, str], tuple[int, int]]
+    latest: int
+
+    def __init__(self: HistoryStore, path: Path, adjacency: str='orthogonal'):
+        """
+        adjacency is the SeatIndex kind (or '+'-joined kinds) that counts as sitting together,
+        as for a planner or analytics.PairReport.
+        """
+        self.path = Path(path)
+        self.adjacency = adjacency
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Imported here so that runs which never open a history do not load sqlite3
+        import sqlite3
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO settings VALUES ('adjacency', ?)", (adjacency,))
+        (stored,) = self.db.execute("SELECT value FROM settings WHERE name = 'adjacency'").fetchone()
+        if stored != adjacency:
+            self.db.close()
+            raise ValueError(f'{self.path} counts {stored} neighbours, not {adjacency}')
+
+        self.counts = {}
+        for (a, b, count, last) in self.db.execute('SELECT a, b, count, last_plan FROM pair_counts'):
+            self.counts[a, b] = (count, last)
+
+        self.latest = self.db.execute('SELECT COALESCE(MAX(id), 0) FROM plans').fetchone()[0]
+
+    @staticmethod
+    def for_class(stem: str, adjacency: str='orthogonal') -> HistoryStore:
+        """
+        Return the store for the class file with the given stem in src/names.
+        """
+        return HistoryStore(PATH_HISTORY / f'{stem}.sqlite3', adjacency)
+
+    def __enter__(self: HistoryStore) -> HistoryStore:
+        return self
+
+    def __exit__(self: HistoryStore, *args):
+        self.close()
+
+    def close(self: HistoryStore):
+        self.db.close()
+
+    @staticmethod
+    def key(a: str, b: str) -> tuple[str, str]:
+        return (a, b) if a < b else (b, a)
+
+    def record(self: HistoryStore, plan: object) -> int:
+        """
+        Append a SeatingPlan to the history and fold its neighbour pairs (by the store's
+        adjacency) into the counts.
+        Return the new plan's id.
+        """
+        with self.db:
+            cursor = self.db.execute(
+                'INSERT INTO plans (created, score) VALUES (?, ?)',
+                (datetime.datetime.now().isoformat(timespec='seconds'), getattr(plan, 'score', 0.0))
+            )
+            plan_id = cursor.lastrowid
+
+            placements = list((plan_id, row, col, s.name) for (row, col, s) in plan.get_placements())
+            self.db.executemany('INSERT INTO placements VALUES (?, ?, ?, ?)', placements)
+
+            keys = list(self.key(*(s.name for s in pair)) for pair in plan.get_neighbour_pairs(self.adjacency))
+            self.db.executemany(
+                'INSERT INTO pair_counts VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (a, b) DO UPDATE SET count = count + 1, last_plan = excluded.last_plan',
+                list((a, b, plan_id) for (a, b) in keys)
+            )
+
+        for k in keys:
+            count, _ = self.counts.get(k, (0, 0))
+            self.counts[k] = (count + 1, plan_id)
+        self.latest = plan_id
+
+        return plan_id
+
+    def get_pair_count(self: HistoryStore, a: str, b: str) -> int:
+        """
+        Return how many recorded plans sat the two named students together.
+        """
+        return self.counts.get(self.key(a, b), (0, 0))[0]
+
+    def get_pair_age(self: HistoryStore, a: str, b: str) -> int|None:
+        """
+        Return how many plans ago the two named students last sat together
+        (0 for the latest plan), or None if they never have.
+        """
+        entry = self.counts.get(self.key(a, b))
+        return None if entry is None else self.latest - entry[1]
+
+    def get_recent_pairs(self: HistoryStore, n_plans: int) -> dict[tuple[str, str], int]:
+        """
+        Return each pair that sat together within the last n_plans plans, with its age.
+        """
+        return {k: self.latest - last for (k, (_, last)) in self.counts.items() if self.latest - last < n_plans}
+
+    def get_n_plans(self: HistoryStore) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM plans').fetchone()[0]
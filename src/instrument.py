@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import datetime
+import os
+import time
+
+# Set to a file path to profile any run of seating.py; .prom writes Prometheus text, anything else JSON lines
+ENV_VAR = 'SEATING_PROFILE'
+
+_NULL = nullcontext()
+_active = None
+
+class Recorder:
+    """
+    Collects per-stage timings, event counters and peak memory while it is active.
+
+    Nothing is recorded unless a recorder is entered as a context manager, and the
+    module-level stage() and count() are near-free no-ops otherwise. Work done in
+    worker processes is timed as a whole by the parent but its counters are not seen.
+    """
+    timings: dict[str, list[float]]
+    counters: dict[str, int]
+    peak_memory: int|None
+    trace_memory: bool
+
+    def __init__(self: Recorder, trace_memory: bool=True):
+        """
+        trace_memory turns on tracemalloc for the recorder's lifetime, which slows
+        allocation-heavy code noticeably; leave it off when only timings matter.
+        """
+        self.timings, self.counters = {}, {}
+        self.peak_memory = None
+        self.trace_memory = trace_memory
+        self._previous = None
+        self._tracing = False
+
+    def __enter__(self: Recorder) -> Recorder:
+        global _active
+        self._previous, _active = _active, self
+
+        # Imported here, like json below, to keep them off the startup path of runs that never profile
+        import tracemalloc
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        return self
+
+    def __exit__(self: Recorder, *args):
+        global _active
+        if self._tracing:
+            import tracemalloc
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self._tracing = False
+        _active = self._previous
+
+    @contextmanager
+    def stage(self: Recorder, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self: Recorder, name: str, seconds: float):
+        entry = self.timings.get(name)
+        if entry is None:
+            self.timings[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def count(self: Recorder, name: str, n: int=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_records(self: Recorder) -> list[dict]:
+        when = datetime.datetime.now().isoformat(timespec='seconds')
+        records = list(
+            {'time': when, 'type': 'stage', 'name': name, 'calls': calls, 'seconds': total, 'max_seconds': most}
+            for (name, (calls, total, most)) in self.timings.items()
+        )
+        records.extend({'time': when, 'type': 'counter', 'name': name, 'value': n} for (name, n) in self.counters.items())
+        if self.peak_memory is not None:
+            records.append({'time': when, 'type': 'memory', 'name': 'peak', 'bytes': self.peak_memory})
+        return records
+
+    def to_json_lines(self: Recorder) -> str:
+        import json
+        return ''.join(json.dumps(record) + '\n' for record in self.to_records())
+
+    def to_prometheus(self: Recorder, prefix: str='seating') -> str:
+        lines = [
+            f'# TYPE {prefix}_stage_calls_total counter',
+            *(f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}' for (name, (calls, _, _)) in self.timings.items()),
+            f'# TYPE {prefix}_stage_seconds_total counter',
+            *(f'{prefix}_stage_seconds_total{{stage="{name}"}} {total:.9f}' for (name, (_, total, _)) in self.timings.items()),
+            f'# TYPE {prefix}_stage_seconds_max gauge',
+            *(f'{prefix}_stage_seconds_max{{stage="{name}"}} {most:.9f}' for (name, (_, _, most)) in self.timings.items()),
+            f'# TYPE {prefix}_events_total counter',
+            *(f'{prefix}_events_total{{event="{name}"}} {n}' for (name, n) in self.counters.items()),
+        ]
+        if self.peak_memory is not None:
+            lines.extend((f'# TYPE {prefix}_peak_memory_bytes gauge', f'{prefix}_peak_memory_bytes {self.peak_memory}'))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self: Recorder, path: Path):
+        """
+        Write the results to path. A .prom file is replaced with Prometheus text, through a
+        temporary file so a scraper never reads half of it; anything else is appended to
+        as JSON lines.
+        """
+        path = Path(path)
+        if path.suffix != '.prom':
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(self.to_json_lines())
+            return
+
+        temp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        try:
+            temp.write_text(self.to_prometheus(), encoding='utf-8')
+            os.replace(temp, path)
+        finally:
+            temp.unlink(missing_ok=True)
+
+def get_active() -> Recorder|None:
+    return _active
+
+def stage(name: str):
+    """
+    Time the enclosed block under name if a recorder is active.
+    """
+    return _NULL if _active is None else _active.stage(name)
+
+def count(name: str, n: int=1):
+    if _active is not None:
+        _active.count(name, n)
+
+def get_env_path() -> Path|None:
+    path = os.environ.get(ENV_VAR)
+    return Path(path) if path else None
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from weakref import WeakKeyDictionary
+import html
+
+class Renderer:
+    """
+    Turns a SeatingPlan into text of some format.
+
+    A renderer is meant to be reused: anything that depends only on the class, like the
+    column width, is worked out once per class and cached. Terminal renderers are given
+    colours for a dark background, the rest colours for a white page.
+    """
+    extension = '.txt'
+    terminal = False
+
+    colours: dict[str, str]
+
+    def __init__(self: Renderer, colours: dict[str, str]=None):
+        self.colours = colours or {}
+        self._widths = WeakKeyDictionary()
+
+    def get_width(self: Renderer, c: object) -> int:
+        """
+        Return the longest student name in the class, recomputed only if the roster grows or shrinks.
+        """
+        n, w = self._widths.get(c, (-1, 0))
+        if n != len(c.students):
+            n, w = len(c.students), max((len(s.name) for s in c.students), default=0)
+            self._widths[c] = (n, w)
+        return w
+
+    @staticmethod
+    def get_rows(plan: object) -> list[list[object]]:
+        """
+        Return the plan as rows of students, with None for gaps and empty seats.
+        """
+        index = plan.potential.get_index()
+        rows = list([None] * index.n_cols for _ in range(index.n_rows))
+        for (row, col, s) in plan.get_placements():
+            rows[row][col] = s
+        return rows
+
+    def render(self: Renderer, plan: object, title: str='') -> str:
+        raise NotImplementedError
+
+class TextRenderer(Renderer):
+
+    def format_cell(self: TextRenderer, s: object, w: int) -> str:
+        return s.name.center(w)
+
+    def render(self: TextRenderer, plan: object, title: str='') -> str:
+        w_col = self.get_width(plan.c)
+        rows = self.get_rows(plan)
+        w_row = w_col * (len(rows[0]) if rows else 0)
+        empty = ' ' * w_col
+        cell = self.format_cell
+
+        lines = ['', title.center(w_row), '', 'Front'.center(w_row), '']
+        lines.extend(''.join(cell(s, w_col) if s else empty for s in row) for row in rows)
+        lines.extend(('', 'Back'.center(w_row), ''))
+        return '\n'.join(lines)
+
+class AnsiRenderer(TextRenderer):
+    """
+    Plain text with each name coloured by gender. The escape codes for each colour are
+    looked up once and reused as a format template. termcolor is only imported then, so
+    runs that never colour anything never load it; csv is deferred the same way.
+    """
+    terminal = True
+
+    def __init__(self: AnsiRenderer, colours: dict[str, str]=None):
+        super().__init__(colours)
+        self._templates = {}
+
+    def format_cell(self: AnsiRenderer, s: object, w: int) -> str:
+        template = self._templates.get(s.gender)
+        if template is None:
+            import termcolor
+            template = self._templates[s.gender] = termcolor.colored('{}', self.colours[s.gender])
+        return template.format(s.name.center(w))
+
+class HtmlRenderer(Renderer):
+    extension = '.html'
+
+    def render(self: HtmlRenderer, plan: object, title: str='') -> str:
+        rows = self.get_rows(plan)
+        n_cols = len(rows[0]) if rows else 0
+
+        def cell(s: object) -> str:
+            if not s:
+                return '<td class="empty"></td>'
+            colour = html.escape(self.colours.get(s.gender, ''), quote=True)
+            return f'<td class="seat" style="color: {colour}" data-clique="{html.escape(s.clique, quote=True)}">{html.escape(s.name)}</td>'
+
+        lines = [
+            '<table class="seating-plan">',
+            f'<caption>{html.escape(title)}</caption>',
+            f'<thead><tr><th colspan="{n_cols}">Front</th></tr></thead>',
+            '<tbody>',
+        ]
+        lines.extend('<tr>' + ''.join(map(cell, row)) + '</tr>' for row in rows)
+        lines.extend((
+            '</tbody>',
+            f'<tfoot><tr><th colspan="{n_cols}">Back</th></tr></tfoot>',
+            '</table>',
+            '',
+        ))
+        return '\n'.join(lines)
+
+class CsvRenderer(Renderer):
+    """
+    One CSV row per row of seats, front first, with blank cells for gaps and empty seats.
+    """
+    extension = '.csv'
+
+    def render(self: CsvRenderer, plan: object, title: str='') -> str:
+        import csv
+        import io
+
+        f = io.StringIO()
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerows(list(s.name if s else '' for s in row) for row in self.get_rows(plan))
+        return f.getvalue()
+
+class SvgRenderer(Renderer):
+    """
+    A printable page: one labelled box per occupied seat, with the front at the top.
+    """
+    extension = '.svg'
+
+    CELL_HEIGHT = 40
+    CHAR_WIDTH = 9
+    PADDING = 8
+    MARGIN = 40
+
+    def render(self: SvgRenderer, plan: object, title: str='') -> str:
+        rows = self.get_rows(plan)
+        n_rows, n_cols = len(rows), len(rows[0]) if rows else 0
+
+        w_cell = self.get_width(plan.c) * SvgRenderer.CHAR_WIDTH + 2 * SvgRenderer.PADDING
+        h_cell = SvgRenderer.CELL_HEIGHT
+        margin = SvgRenderer.MARGIN
+        width = n_cols * w_cell + 2 * margin
+        height = n_rows * h_cell + 3 * margin
+
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="14">',
+            f'<text x="{width / 2}" y="{margin / 2}" text-anchor="middle">{html.escape(title)}</text>',
+            f'<text x="{width / 2}" y="{margin}" text-anchor="middle" font-weight="bold">Front</text>',
+        ]
+
+        top = margin * 1.5
+        for (i_row, row) in enumerate(rows):
+            for (i_col, s) in enumerate(row):
+                if not s:
+                    continue
+                x, y = margin + i_col * w_cell, top + i_row * h_cell
+                colour = html.escape(self.colours.get(s.gender, 'black'), quote=True)
+                parts.append(f'<rect x="{x + 2}" y="{y + 2}" width="{w_cell - 4}" height="{h_cell - 4}" fill="none" stroke="black"/>')
+                parts.append(f'<text x="{x + w_cell / 2}" y="{y + h_cell / 2 + 5}" text-anchor="middle" fill="{colour}">{html.escape(s.name)}</text>')
+
+        parts.append(f'<text x="{width / 2}" y="{top + n_rows * h_cell + margin / 2}" text-anchor="middle" font-weight="bold">Back</text>')
+        parts.append('</svg>')
+        parts.append('')
+        return '\n'.join(parts)
+
+RENDERERS = {
+    'ansi': AnsiRenderer,
+    'text': TextRenderer,
+    'html': HtmlRenderer,
+    'csv': CsvRenderer,
+    'svg': SvgRenderer,
+}
+
+_instances = {}
+
+def get_renderer(name: str, colours: dict[str, str]=None) -> Renderer:
+    """
+    Return the shared renderer for a format, so its per-class caches outlive a single plan.
+    """
+    if name not in _instances:
+        _instances[name] = RENDERERS[name](colours)
+    return _instances[name]
@@ -1,32 +1,69 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterator
+from collections.abc import Callable, Iterable, Iterator
+from array import array
+from collections import OrderedDict
+from contextlib import nullcontext
+from operator import itemgetter
+import argparse
+import glob
+import hashlib
+import heapq
+import math
 import random
+import select
 import datetime
 import os
-import termcolor
+import sys
+import time
+
+from history import HistoryStore
+import classfile
+import instrument
+import render
+import solver
 
 MIN_OFFSET = 3
 OFFSET_PROPORTION = 3
 
 PATH_CLASSES = Path('src/names')
+PATH_PLANS = Path('src/plans')
 
 DEFAULT_GENDER = 'C'
 
+# A hard constraint is a soft one whose weight no trade-off can justify breaking
+HARD_WEIGHT = 1000.0
+
+# How long the interactive loop keeps improving a plan, and how often it redraws it
+RUN_TIME_LIMIT = 10.0
+RUN_REFRESH = 0.25
+
 GENDER_TO_COLOUR = {
     'M' : 'blue',
     'F' : 'magenta',
     DEFAULT_GENDER : 'white'
 }
 
+# The same genders on a white page, for the HTML and SVG renderers
+GENDER_TO_PRINT_COLOUR = {
+    'M' : 'blue',
+    'F' : 'magenta',
+    DEFAULT_GENDER : 'black'
+}
+
 class Student:
+    __slots__ = ('name', 'gender', 'clique', 'id')
+
     name: str
     gender: str
     clique: str
+    id: int
 
     def __init__(self: Student, name: str, gender: str=DEFAULT_GENDER, clique: str=''):
-        self.name, self.gender, self.clique = name, gender, clique
+        # Genders and cliques repeat across a whole school; share one copy of each string
+        self.name, self.gender, self.clique = name, sys.intern(gender), sys.intern(clique)
+        self.id = -1
 
     def __repr__(self: Student) -> str:
         return self.name
@@ -84,151 +121,1332 @@ class BlankLayout(ClassroomLayout):
     def from_layout(layout: ClassroomLayout) -> BlankLayout:
         return ClassroomLayout.from_dimensions(layout.get_n_rows(), layout.get_n_cols())
 
+class SeatIndex:
+    """
+    Immutable, array-backed geometry of a PotentialLayout, built once per grid.
+
+    Seats are numbered 0 .. n_seats - 1 in reading order. rows/cols give each seat's
+    position and seat_at maps row * n_cols + col back to a seat (or -1). Neighbours of
+    each ADJACENCY_KINDS kind are stored CSR-style: the neighbours of seat i are
+    targets[kind][offsets[kind][i]:offsets[kind][i + 1]].
+    """
+    __slots__ = ('n_rows', 'n_cols', 'n_seats', 'rows', 'cols', 'seat_at', 'offsets', 'targets', '_lists')
+
+    ADJACENCY_KINDS = ('orthogonal', 'diagonal', 'pair')
+
+    def __init__(self: SeatIndex, grid: Iterable[Iterable[bool]]):
+        grid = list(list(row) for row in grid)
+        n_rows = len(grid)
+        n_cols = max((len(row) for row in grid), default=0)
+
+        rows, cols = array('h'), array('h')
+        seat_at = array('h', [-1]) * (n_rows * n_cols)
+        for (i_row, row) in enumerate(grid):
+            for (i_col, col) in enumerate(row):
+                if col:
+                    seat_at[i_row * n_cols + i_col] = len(rows)
+                    rows.append(i_row)
+                    cols.append(i_col)
+
+        def at(row: int, col: int) -> int:
+            if 0 <= row < n_rows and 0 <= col < n_cols:
+                return seat_at[row * n_cols + col]
+            return -1
+
+        around = {
+            'orthogonal': ((0, -1), (0, 1), (-1, 0), (1, 0)),
+            'diagonal': ((-1, -1), (-1, 1), (1, -1), (1, 1)),
+        }
+
+        # Desks pair up left to right within each unbroken run of seats in a row
+        partner = [-1] * len(rows)
+        for i in range(len(rows)):
+            left = at(rows[i], cols[i] - 1)
+            if partner[i] == -1 and (left == -1 or partner[left] != -1):
+                right = at(rows[i], cols[i] + 1)
+                if right != -1:
+                    partner[i], partner[right] = right, i
+
+        offsets, targets = {}, {}
+        for kind in SeatIndex.ADJACENCY_KINDS:
+            o, t = array('i', [0]), array('h')
+            for i in range(len(rows)):
+                if kind == 'pair':
+                    found = [partner[i]] if partner[i] != -1 else []
+                else:
+                    found = (at(rows[i] + dr, cols[i] + dc) for (dr, dc) in around[kind])
+                t.extend(n for n in found if n != -1)
+                o.append(len(t))
+            offsets[kind], targets[kind] = memoryview(o).toreadonly(), memoryview(t).toreadonly()
+
+        setattr_ = object.__setattr__
+        setattr_(self, 'n_rows', n_rows)
+        setattr_(self, 'n_cols', n_cols)
+        setattr_(self, 'n_seats', len(rows))
+        setattr_(self, 'rows', memoryview(rows).toreadonly())
+        setattr_(self, 'cols', memoryview(cols).toreadonly())
+        setattr_(self, 'seat_at', memoryview(seat_at).toreadonly())
+        setattr_(self, 'offsets', offsets)
+        setattr_(self, 'targets', targets)
+        setattr_(self, '_lists', {})
+
+    def __setattr__(self: SeatIndex, name: str, val: object):
+        raise AttributeError('SeatIndex is immutable; change the layout grid instead')
+
+    def get_seat(self: SeatIndex, row: int, col: int) -> int:
+        """
+        Return the seat at a grid position, or -1 if there is none.
+        """
+        if 0 <= row < self.n_rows and 0 <= col < self.n_cols:
+            return self.seat_at[row * self.n_cols + col]
+        return -1
+
+    def get_position(self: SeatIndex, seat: int) -> tuple[int, int]:
+        return self.rows[seat], self.cols[seat]
+
+    def get_neighbours(self: SeatIndex, seat: int, kind: str='orthogonal') -> memoryview:
+        o = self.offsets[kind]
+        return self.targets[kind][o[seat]:o[seat + 1]]
+
+    def get_neighbour_lists(self: SeatIndex, kind: str='orthogonal') -> tuple[tuple[int, ...], ...]:
+        """
+        Return every seat's neighbours as tuples, the form the solver iterates fastest.
+        Kinds can be combined with '+', e.g. 'orthogonal+diagonal'.
+        """
+        if kind not in self._lists:
+            kinds = kind.split('+')
+            self._lists[kind] = tuple(
+                tuple(n for k in kinds for n in self.get_neighbours(i, k))
+                for i in range(self.n_seats)
+            )
+        return self._lists[kind]
+
 class PotentialLayout(ClassroomLayout):
-    grid: list[list[bool]]
+    grid: list[tuple[bool, ...]]
+
+    @property
+    def grid(self: PotentialLayout) -> list[tuple[bool, ...]]:
+        return self._grid
+
+    @grid.setter
+    def grid(self: PotentialLayout, grid: Iterable[Iterable[bool]]):
+        # Rows are frozen so that every change goes through here and drops the index
+        self._grid = list(tuple(row) for row in grid)
+        self._index = None
+        self._fingerprint = None
+
+    def __setitem__(self: PotentialLayout, idx: int, val: Iterable[bool]):
+        self._grid[idx] = tuple(val)
+        self._index = None
+        self._fingerprint = None
+
+    def get_fingerprint(self: PotentialLayout) -> str:
+        """
+        Return a stable hash of the grid, recomputed only after the grid changes.
+        """
+        if self._fingerprint is None:
+            text = '\n'.join(''.join('1' if c else '0' for c in row) for row in self._grid)
+            self._fingerprint = hashlib.blake2b(text.encode('ascii'), digest_size=8).hexdigest()
+        return self._fingerprint
+
+    def __getstate__(self: PotentialLayout) -> dict:
+        # The index holds memoryviews, which do not pickle; it is rebuilt on demand
+        state = self.__dict__.copy()
+        state['_index'] = None
+        return state
+
+    def get_index(self: PotentialLayout) -> SeatIndex:
+        """
+        Return the layout's seat index, building it on first use after a grid change.
+        """
+        if self._index is None:
+            with instrument.stage('index'):
+                self._index = SeatIndex(self._grid)
+        return self._index
 
-    def get_n_seats(self: ClassroomLayout) -> int:
-        return sum(sum(row) for row in self)
+    def get_n_seats(self: PotentialLayout) -> int:
+        return self.get_index().n_seats
     
-    def get_seats(self: ClassroomLayout) -> set[tuple[bool]]:
+    def get_seats(self: PotentialLayout) -> set[tuple[int, int]]:
         """
         Return a set of tuples of [row, col] for available seats in this layout.
         """
-        positions = set()
-        for (i_row, row) in enumerate(self):
-            for (i_col, col) in enumerate(row):
-                if col:
-                    positions.add((i_row, i_col))
-        return positions
+        return set(self.get_seat_list())
+
+    def get_seat_list(self: PotentialLayout) -> list[tuple[int, int]]:
+        """
+        Return the available seats in reading order, so that a seat has a stable index.
+        """
+        index = self.get_index()
+        return list(zip(index.rows, index.cols))
+
+    def get_neighbours(self: PotentialLayout, kind: str='orthogonal') -> tuple[tuple[int, ...], ...]:
+        """
+        Return, for each seat index, the indices of its neighbours of the given kind.
+        """
+        return self.get_index().get_neighbour_lists(kind)
+
+class SpatialIndex:
+    """
+    Uniform grid buckets over a fixed set of points, for radius and nearest-neighbour queries
+    that only look at the buckets a query can reach.
+    """
+    points: tuple[tuple[float, float], ...]
+    cell: float
+
+    def __init__(self: SpatialIndex, points: Iterable[tuple[float, float]], cell: float=1.0):
+        self.points, self.cell = tuple(points), cell
+        self.buckets = {}
+        for (i, p) in enumerate(self.points):
+            self.buckets.setdefault(self.get_bucket(p), []).append(i)
+
+    def get_bucket(self: SpatialIndex, p: tuple[float, float]) -> tuple[int, int]:
+        return math.floor(p[0] / self.cell), math.floor(p[1] / self.cell)
+
+    def within(self: SpatialIndex, p: tuple[float, float], d: float) -> list[int]:
+        """
+        Return the indices of all points within distance d of p.
+        """
+        (bx, by), reach = self.get_bucket(p), math.ceil(d / self.cell)
+        found = []
+        for x in range(bx - reach, bx + reach + 1):
+            for y in range(by - reach, by + reach + 1):
+                for i in self.buckets.get((x, y), ()):
+                    if math.dist(p, self.points[i]) <= d:
+                        found.append(i)
+        return found
+
+    def nearest(self: SpatialIndex, p: tuple[float, float], k: int=1) -> list[int]:
+        """
+        Return the indices of the k points nearest p, nearest first, searching outward
+        one ring of buckets at a time until no unsearched bucket could hold anything closer.
+        """
+        k = min(k, len(self.points))
+        bx, by = self.get_bucket(p)
+        found = []
+        ring = 0
+        while True:
+            for x in range(bx - ring, bx + ring + 1):
+                for y in range(by - ring, by + ring + 1):
+                    if max(abs(x - bx), abs(y - by)) == ring:
+                        found.extend((math.dist(p, self.points[i]), i) for i in self.buckets.get((x, y), ()))
+
+            found.sort()
+            # Everything beyond this ring is at least ring * cell away
+            if len(found) >= k and found[k - 1][0] <= ring * self.cell:
+                break
+            if ring * self.cell > 2 * self.get_extent() + self.cell:
+                break
+            ring += 1
+
+        return list(i for (_, i) in found[:k])
+
+    def get_extent(self: SpatialIndex) -> float:
+        if not self.points:
+            return 0.0
+        xs, ys = list(p[0] for p in self.points), list(p[1] for p in self.points)
+        return max(max(xs) - min(xs), max(ys) - min(ys))
+
+class GeometricLayout(PotentialLayout):
+    """
+    A layout whose seats are real (x, y) positions, measured in desk widths with y
+    increasing away from the front: V shapes, semicircles, seats along any polygon.
+
+    Seats are neighbours when they are within radius of each other. That adjacency is
+    worked out once, through a SpatialIndex, and is what every adjacency kind means here.
+    The boolean grid is derived by snapping each seat to a cell, and is what plans are
+    drawn on; seat i of the grid's SeatIndex is seat i of points.
+    """
+    points: tuple[tuple[float, float], ...]
+    radius: float
+
+    def __init__(self: GeometricLayout, points: Iterable[tuple[float, float]], radius: float=1.5):
+        points = list(points)
+
+        # Snap to cells, nudging right along the row if two seats land in the same one
+        cells, taken = {}, set()
+        min_x = min((x for (x, _) in points), default=0.0)
+        min_y = min((y for (_, y) in points), default=0.0)
+        for (i, (x, y)) in sorted(enumerate(points), key=lambda item: (item[1][1], item[1][0])):
+            cell = (round(y - min_y), round(x - min_x))
+            while cell in taken:
+                cell = (cell[0], cell[1] + 1)
+            cells[i] = cell
+            taken.add(cell)
+
+        n_rows = max((row for (row, _) in cells.values()), default=-1) + 1
+        n_cols = max((col for (_, col) in cells.values()), default=-1) + 1
+        grid = list([False] * n_cols for _ in range(n_rows))
+        for (row, col) in cells.values():
+            grid[row][col] = True
+
+        # Reorder points to match the SeatIndex's reading order
+        order = sorted(cells, key=lambda i: cells[i])
+        self.points = tuple(points[i] for i in order)
+        self.radius = radius
+        self.spatial = SpatialIndex(self.points, radius)
+        self._distance_neighbours = None
+
+        super().__init__(grid)
+
+    def get_fingerprint(self: GeometricLayout) -> str:
+        # Neighbours come from the points, not the grid, so they are hashed too
+        if self._fingerprint is None:
+            h = hashlib.blake2b(super().get_fingerprint().encode('ascii'), digest_size=8)
+            h.update(repr((self.points, self.radius)).encode('ascii'))
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def get_neighbours(self: GeometricLayout, kind: str='distance') -> tuple[tuple[int, ...], ...]:
+        """
+        Return, for each seat, the other seats within radius, whatever kind is asked for.
+        """
+        if self._distance_neighbours is None:
+            self._distance_neighbours = tuple(
+                tuple(sorted(j for j in self.spatial.within(p, self.radius) if j != i))
+                for (i, p) in enumerate(self.points)
+            )
+        return self._distance_neighbours
+
+    def get_nearest(self: GeometricLayout, seat: int, k: int=1) -> list[int]:
+        """
+        Return the k seats nearest the given seat, nearest first.
+        """
+        return list(i for i in self.spatial.nearest(self.points[seat], k + 1) if i != seat)[:k]
+
+    def get_within(self: GeometricLayout, seat: int, d: float) -> list[int]:
+        return list(i for i in self.spatial.within(self.points[seat], d) if i != seat)
+
+    @staticmethod
+    def get_tiers(n: int) -> list[int]:
+        """
+        Return how many seats each tier of a V holds, front first: a lone seat at the front
+        if n is odd, then pairs (as in _old/seating_v.py).
+        """
+        tiers = [1] if n % 2 else []
+        tiers.extend([2] * (n // 2))
+        return tiers
+
+    @staticmethod
+    def v_shape(n: int, offset: float=1.0, gap: float=1.0, depth: float=1.0, radius: float=1.5) -> GeometricLayout:
+        """
+        Return a V of n seats opening towards the back: each tier's pair sits offset desks
+        further apart than the one in front, starting gap desks apart.
+        """
+        points = []
+        for (i, size) in enumerate(GeometricLayout.get_tiers(n)):
+            if size == 1:
+                points.append((0.0, i * depth))
+            else:
+                half = gap / 2 + 0.5 + i * offset
+                points.extend(((-half, i * depth), (half, i * depth)))
+        return GeometricLayout(points, radius)
+
+    @staticmethod
+    def semicircle(n: int, gap: float=1.0, spacing: float=1.0, radius: float=1.5) -> GeometricLayout:
+        """
+        Return n seats on an arc that is open towards the front, with its two halves gap
+        desks apart at the back (see src/notes/arrangement.txt).
+        """
+        # Arc length covers n desks plus the gap, over half a circle
+        r = (n * spacing + gap) / math.pi
+        half_gap = (gap + spacing) / 2 / r
+
+        points = []
+        for i in range(n):
+            # Spread seats from the front-left end to the front-right end, skipping the gap
+            side, j = (-1, i) if i < (n + 1) // 2 else (1, n - 1 - i)
+            per_side = (n + 1) // 2 if side == -1 else n // 2
+            theta = j / max(1, per_side - 1) * (math.pi / 2 - half_gap) if per_side > 1 else 0.0
+            points.append((side * r * math.cos(theta), r * math.sin(theta)))
+
+        return GeometricLayout(points, radius)
+
+    @staticmethod
+    def polygon(vertices: list[tuple[float, float]], n: int=None, spacing: float=1.0, closed: bool=False, radius: float=1.5) -> GeometricLayout:
+        """
+        Return seats spaced evenly along a polygonal path (closed for a ring of desks).
+        With n, the spacing stretches to fit exactly n seats.
+        """
+        path = list(vertices) + ([vertices[0]] if closed else [])
+        lengths = list(math.dist(a, b) for (a, b) in zip(path, path[1:]))
+        total = sum(lengths)
+
+        if n is None:
+            n = int(total / spacing) + (0 if closed else 1)
+        step = total / (n if closed else max(1, n - 1))
+
+        points = []
+        for i in range(n):
+            d = i * step
+            for ((a, b), length) in zip(zip(path, path[1:]), lengths):
+                if d <= length or (a, b) == (path[-2], path[-1]):
+                    t = d / length if length else 0.0
+                    points.append((a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t))
+                    break
+                d -= length
+
+        return GeometricLayout(points, radius)
 
 class PlannedLayout(ClassroomLayout):
     grid: list[list[str|Student]]
 
 class SeatingPlan:
+    """
+    A plan is stored compactly as one int16 per seat of its PotentialLayout, holding the
+    id of the student in that seat or EMPTY. The grid of students is only built when
+    something asks for .layout.
+    """
+    __slots__ = ('c', 'potential', 'assignment', 'score', 'lower_bound', 'seed', 'absent', 'disabled')
+
+    EMPTY = -1
+
     c: Class
-    layout: PlannedLayout
+    potential: PotentialLayout
+    assignment: array
+    score: float
+    lower_bound: float|None
+    seed: int|None
+    absent: frozenset[int]
+    disabled: frozenset[int]
 
-    def __init__(self: SeatingPlan, c: Class, layout: PlannedLayout):
-        self.c, self.layout = c, layout
-    
-    def __str__(self: SeatingPlan):
-        w_col = Utilities.get_longest_length(s.name for s in self.c.students)
-        w_row = w_col * self.layout.get_n_cols()
-        empty = ' ' * w_col
+    def __init__(self: SeatingPlan, c: Class, potential: PotentialLayout, assignment: array, score: float=0.0, lower_bound: float=None, seed: int=None,
+                 absent: frozenset[int]=frozenset(), disabled: frozenset[int]=frozenset()):
+        """
+        score is the total constraint penalty of the plan; 0 means nothing was violated.
+        lower_bound, if the solver could prove one, is the least score any plan could have.
+        seed, if known, regenerates the same plan from the same class, layouts and constraints.
+        absent is the ids of students on the roster left out of this plan only, and disabled
+        the seats it had to leave empty; SeatingPlanner.repair_plan carries both forward.
+        """
+        self.c, self.potential, self.assignment, self.score = c, potential, assignment, score
+        self.lower_bound, self.seed = lower_bound, seed
+        self.absent, self.disabled = absent, disabled
 
-        s = '\n' + Utilities.format_now().center(w_row) + '\n\n'
-        s += 'Front'.center(w_row) + '\n\n'
+    @property
+    def fingerprint(self: SeatingPlan) -> str:
+        """
+        Return a stable hash of who sits where: the layout's grid plus the seat-to-student vector.
+        """
+        assignment = self.assignment
+        if sys.byteorder != 'little':
+            assignment = array('h', assignment)
+            assignment.byteswap()
+        h = hashlib.blake2b(self.potential.get_fingerprint().encode('ascii'), digest_size=8)
+        h.update(assignment.tobytes())
+        return h.hexdigest()
 
-        for row in self.layout:
-            line = ""
+    def get_size(self: SeatingPlan) -> int:
+        """
+        Return roughly how many bytes the plan itself holds, for bounding caches.
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self.assignment)
 
-            for col in row:
+    @property
+    def gap(self: SeatingPlan) -> float|None:
+        """
+        Return how far the score may be above optimal, as a fraction of the score:
+        0 for a proven optimum, None if no bound is known.
+        """
+        if self.lower_bound is None:
+            return None
+        if self.score <= 0:
+            return 0.0
+        return max(0.0, (self.score - self.lower_bound) / self.score)
 
-                # Students are non-blank
-                if col:
-                    name = col.name
-                    gender = col.gender
-                    colour = GENDER_TO_COLOUR[gender]
-                    line += termcolor.colored(name.center(w_col), colour)
+    @property
+    def layout(self: SeatingPlan) -> PlannedLayout:
+        index = self.potential.get_index()
+        layout = PlannedLayout(list([''] * index.n_cols for _ in range(index.n_rows)))
+        for (row, col, student) in self.get_placements():
+            layout[row][col] = student
+        return layout
 
-                else:
-                    line += empty
-            
-            s += line + '\n'
+    def get_placements(self: SeatingPlan) -> Iterator[tuple[int, int, Student]]:
+        """
+        Yield (row, col, student) for every occupied seat.
+        """
+        index, students = self.potential.get_index(), self.c.students
+        for (seat, i) in enumerate(self.assignment):
+            if i != SeatingPlan.EMPTY:
+                yield index.rows[seat], index.cols[seat], students[i]
+
+    def get_neighbour_pairs(self: SeatingPlan, adjacency: str='orthogonal') -> set[frozenset[Student]]:
+        """
+        Return the pairs of students who are neighbours of the given SeatIndex kind (or
+        '+'-joined kinds): the same sense of sitting together as a planner's adjacency,
+        the history store and analytics.PairReport use.
+        """
+        neighbours, students = self.potential.get_neighbours(adjacency), self.c.students
+        assignment = self.assignment
+
+        pairs = set()
+        for (seat, i) in enumerate(assignment):
+            if i == SeatingPlan.EMPTY:
+                continue
+            for other in neighbours[seat]:
+                j = assignment[other]
+                if other > seat and j != SeatingPlan.EMPTY:
+                    pairs.add(frozenset({students[i], students[j]}))
+
+        return pairs
+
+    def __str__(self: SeatingPlan):
+        return self.to_text()
 
-        s += '\n' + 'Back'.center(w_row) + '\n'
-        return s
+    def to_text(self: SeatingPlan, colour: bool=True) -> str:
+        return self.render('ansi' if colour else 'text')
+
+    def render(self: SeatingPlan, fmt: str='ansi') -> str:
+        """
+        Render the plan in one of render.RENDERERS' formats.
+        """
+        with instrument.stage('render'):
+            colours = GENDER_TO_COLOUR if render.RENDERERS[fmt].terminal else GENDER_TO_PRINT_COLOUR
+            return render.get_renderer(fmt, colours).render(self, Utilities.format_now())
         
+class Constraint:
+    """
+    A preference about who sits where. Constraints compile themselves into the
+    unary (student, seat) and pairwise (student, student) costs of a solver.Problem.
+    """
+    weight: float
+
+    def __init__(self: Constraint, weight: float=1.0, hard: bool=False):
+        if weight < 0:
+            raise ValueError(f'Constraint weight must not be negative, not {weight}')
+        self.weight = HARD_WEIGHT if hard else weight
+
+    def add_to(self: Constraint, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        raise NotImplementedError
+
+    def get_key(self: Constraint) -> tuple:
+        """
+        Return a hashable description of the constraint, equal for constraints that cost the same.
+        """
+        return (type(self).__name__, Constraint.freeze(vars(self)))
+
+    @staticmethod
+    def freeze(val: object) -> object:
+        if isinstance(val, Student):
+            return val.name
+        if isinstance(val, HistoryStore):
+            return (str(val.path), val.latest)
+        if isinstance(val, dict):
+            return tuple(sorted(((Constraint.freeze(k), Constraint.freeze(v)) for (k, v) in val.items()), key=repr))
+        if isinstance(val, (set, frozenset, list, tuple)):
+            frozen = tuple(Constraint.freeze(v) for v in val)
+            return frozen if isinstance(val, (list, tuple)) else tuple(sorted(frozen, key=repr))
+        return val
+
+class SeparateCliques(Constraint):
+    cliques: set[str]|None
+
+    def __init__(self: SeparateCliques, cliques: Iterable[str]|None=None, weight: float=1.0, hard: bool=False):
+        """
+        Penalise neighbours who share a clique. If cliques is given, only those cliques count.
+        """
+        super().__init__(weight, hard)
+        self.cliques = None if cliques is None else set(cliques)
+
+    def add_to(self: SeparateCliques, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        groups = {}
+        for (i, s) in enumerate(students):
+            if s.clique and (self.cliques is None or s.clique in self.cliques):
+                groups.setdefault(s.clique, []).append(i)
+        problem.add_groups(groups.values(), self.weight)
+
+class NoSameGenderNeighbours(Constraint):
+
+    def add_to(self: NoSameGenderNeighbours, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        groups = {}
+        for (i, s) in enumerate(students):
+            if s.gender != DEFAULT_GENDER:
+                groups.setdefault(s.gender, []).append(i)
+        problem.add_groups(groups.values(), self.weight)
+
+class FrontSeats(Constraint):
+    students: set[Student]
+    n_rows: int
+
+    def __init__(self: FrontSeats, students: Iterable[Student], n_rows: int=1, weight: float=1.0, hard: bool=False):
+        """
+        Penalise each of the given students for every row they sit behind the first n_rows.
+        """
+        super().__init__(weight, hard)
+        self.students, self.n_rows = set(students), n_rows
+
+    def add_to(self: FrontSeats, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        for (i, s) in enumerate(students):
+            if s in self.students:
+                for (seat, (row, _)) in enumerate(seats):
+                    if row >= self.n_rows:
+                        problem.add_unary(i, seat, self.weight * (row - self.n_rows + 1))
+
+class DistanceFromBoard(Constraint):
+    students: set[Student]|None
+
+    def __init__(self: DistanceFromBoard, students: Iterable[Student]=None, weight: float=1.0, hard: bool=False):
+        """
+        Penalise the given students (or everyone) by weight for each row back from the board.
+        """
+        super().__init__(weight, hard)
+        self.students = None if students is None else set(students)
+
+    def add_to(self: DistanceFromBoard, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        for (i, s) in enumerate(students):
+            if self.students is None or s in self.students:
+                for (seat, (row, _)) in enumerate(seats):
+                    if row:
+                        problem.add_unary(i, seat, self.weight * row)
+
+class SeatCosts(Constraint):
+    costs: dict[Student, dict[tuple[int, int], float]]
+
+    def __init__(self: SeatCosts, costs: dict[Student, dict[tuple[int, int], float]], weight: float=1.0, hard: bool=False):
+        """
+        Charge each student the given cost (times weight) for sitting at each (row, col).
+        Costs must not be negative: the solvers take a score of 0 as a proven optimum.
+        """
+        super().__init__(weight, hard)
+        for (s, seat_costs) in costs.items():
+            for (position, cost) in seat_costs.items():
+                if cost < 0:
+                    raise ValueError(f'Seat cost for {s.name} at {position} must not be negative, not {cost}')
+        self.costs = costs
+
+    def add_to(self: SeatCosts, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        for (i, s) in enumerate(students):
+            costs = self.costs.get(s)
+            if costs:
+                for (seat, position) in enumerate(seats):
+                    if position in costs:
+                        problem.add_unary(i, seat, self.weight * costs[position])
+
+class AvoidPairs(Constraint):
+    pairs: set[frozenset[Student]]
+
+    def __init__(self: AvoidPairs, pairs: Iterable[Iterable[Student]], weight: float=1.0, hard: bool=False):
+        super().__init__(weight, hard)
+        self.pairs = set(frozenset(pair) for pair in pairs)
+
+    @staticmethod
+    def from_plan(plan: SeatingPlan, weight: float=1.0, hard: bool=False, adjacency: str='orthogonal') -> AvoidPairs:
+        """
+        Avoid seating anyone beside the same person as in a previous plan, where beside
+        means neighbours of the given adjacency kind.
+        """
+        return AvoidPairs(plan.get_neighbour_pairs(adjacency), weight, hard)
+
+    def add_to(self: AvoidPairs, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        ids = {s: i for (i, s) in enumerate(students)}
+        for pair in self.pairs:
+            if len(pair) == 2 and all(s in ids for s in pair):
+                a, b = pair
+                problem.add_pair(ids[a], ids[b], self.weight)
+
+class AvoidRecentPairs(Constraint):
+    history: HistoryStore
+    n_plans: int
+    decay: float
+
+    def __init__(self: AvoidRecentPairs, history: HistoryStore, n_plans: int=4, decay: float=0.5, weight: float=1.0, hard: bool=False):
+        """
+        Penalise pairs who sat together in the last n_plans recorded plans, by weight for the
+        latest plan and by a further factor of decay for each plan before that. Sitting
+        together means whatever the store's adjacency is, which should be the planner's.
+        """
+        super().__init__(weight, hard)
+        self.history, self.n_plans, self.decay = history, n_plans, decay
+
+    def add_to(self: AvoidRecentPairs, problem: solver.Problem, students: list[Student], seats: list[tuple[int, int]]):
+        ids = {s.name: i for (i, s) in enumerate(students)}
+        for ((a, b), age) in self.history.get_recent_pairs(self.n_plans).items():
+            if a in ids and b in ids:
+                problem.add_pair(ids[a], ids[b], self.weight * self.decay ** age)
+
 class Class:
     rooms: list[Classroom]
     students: list[Student]
+    ids: dict[str, int]
+    left: set[int]
 
     def __init__(self: Class):
+        """
+        students doubles as the id table: a student's id is its index in the list. So a
+        student who leaves stays in it, and only their id goes into left.
+        """
         self.rooms = []
         self.students = []
+        self.ids = {}
+        self.left = set()
+
+    def add_student(self: Class, s: Student) -> int:
+        """
+        Add a student to the roster, or bring back one who left, and return their id.
+        """
+        if s.name in self.ids:
+            s.id = self.ids[s.name]
+            self.left.discard(s.id)
+            return s.id
+
+        s.id = len(self.students)
+        self.students.append(s)
+        self.ids[s.name] = s.id
+        return s.id
+
+    def remove_student(self: Class, s: Student):
+        self.left.add(self.ids[s.name])
+
+    def get_roster(self: Class) -> list[Student]:
+        """
+        Return the students still in the class, in id order.
+        """
+        if not self.left:
+            return self.students
+        return list(s for s in self.students if s.id not in self.left)
+
+    def get_fingerprint(self: Class) -> str:
+        """
+        Return a stable hash of the roster, in id order.
+        """
+        h = hashlib.blake2b(digest_size=8)
+        for s in self.students:
+            h.update(f'{s.name}:{s.gender}:{s.clique}\n'.encode('utf-8'))
+        if self.left:
+            h.update(f'left:{sorted(self.left)}'.encode('ascii'))
+        return h.hexdigest()
+
+class PlanCache:
+    """
+    Least-recently-used store of finished plans, bounded by entry count and by bytes.
+    """
+    max_entries: int
+    max_bytes: int
+    n_bytes: int
+    hits: int
+    misses: int
+
+    def __init__(self: PlanCache, max_entries: int=256, max_bytes: int=16 * 1024 * 1024):
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self.entries = OrderedDict()
+        self.n_bytes, self.hits, self.misses = 0, 0, 0
+
+    def __len__(self: PlanCache) -> int:
+        return len(self.entries)
+
+    def get(self: PlanCache, key: tuple) -> SeatingPlan|None:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self: PlanCache, key: tuple, plan: SeatingPlan):
+        if key in self.entries:
+            self.n_bytes -= self.entries.pop(key)[1]
+
+        size = plan.get_size()
+        self.entries[key] = (plan, size)
+        self.n_bytes += size
+
+        while self.entries and (len(self.entries) > self.max_entries or self.n_bytes > self.max_bytes):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.n_bytes -= size
 
 class SeatingPlanner:
     c: Class
+    path: Path
+    history: HistoryStore
     name_length: int
+    constraints: list[Constraint]
+    solver: str
+    adjacency: str
+    workers: int|None
+    cache: PlanCache|None
+    # Annotation only: concurrent.futures is imported where a pool is started, as it
+    # costs more startup time than everything else a one-shot run needs put together
+    executor: Executor|None
 
-    def __init__(self: SeatingPlanner):
+    def __init__(self: SeatingPlanner, constraints: list[Constraint]=None, solver: str='random', adjacency: str='orthogonal', workers: int=None, cache: PlanCache=None, executor: Executor=None):
+        """
+        solver names one of solver.SOLVERS: 'random' for a plain shuffle (constraints are
+        scored but ignored), 'anneal' for local search against the constraints, 'exact'
+        for a minimum-cost assignment that also reports its optimality gap.
+        adjacency is the SeatIndex kind (or '+'-joined kinds) that counts as neighbours.
+        workers, if given, is how many processes make_plan may use to solve layouts side by side.
+        cache, if given, lets make_plan return a plan it has already made for the same inputs and seed.
+        executor, if given, is a long-lived pool that make_plan solves on instead of starting its own.
+        """
         self.c = None
+        self.path = None
+        self.history = None
         self.name_length = 0
+        self.constraints = constraints or []
+        self.solver = solver
+        self.adjacency = adjacency
+        self.workers = workers
+        self.cache = cache
+        self.executor = executor
 
     @staticmethod
-    def parse_data(path: Path) -> tuple[list[str], dict[str, str], list[list[bool]]]:
+    def parse_data(path: Path, use_cache: bool=True) -> Class:
         """
-        Return:
-        1. A list of names
-        2. A dictionary of name to gender
-        3. A list of lists of booleans representing placeable grid positions
+        Return the Class described by a class file: students from its names:: section
+        (name[:gender[:clique]] per line), a Classroom per room:: section and one layout
+        per grid:: section within it.
+        Raises classfile.ParseError, with the line number, on malformed input.
         """
+        with instrument.stage('parse'):
+            data = classfile.load(path, GENDER_TO_COLOUR, DEFAULT_GENDER, use_cache)
 
-        c = Class()
-        grid = []
-
-        with open(path, 'r', encoding='utf-8') as f:
-            state = 0
-            for line in filter(None, (line.strip() for line in f.readlines())):
-
-                if '::' in line:
-                    k, _ = line.split('::')
-                    
-                    if k == 'names':
-                        state = 1
-                    elif k == 'grid':
-                        state = 2
-                else:
-                    if state == 1:
-                        name, *parts = line.split(':')
-
-                        if parts:
-                            gender, *parts = parts
-                        else:
-                            gender = DEFAULT_GENDER
+            c = Class()
+            for (name, gender, clique) in data.students:
+                c.add_student(Student(name, gender, clique))
 
-                        c.students.append(Student(name, gender))
-
-                    elif state == 2:
-                        ints = list(bool(int(c)) for c in line.replace(' ', ''))
-                        grid.append(ints)
-        
-        c.rooms.append(Classroom.from_grid(grid))
+            for grids in data.rooms:
+                room = Classroom()
+                room.layouts.extend(PotentialLayout(grid) for grid in grids)
+                c.rooms.append(room)
         return c
     
+    def get_layouts(self: SeatingPlanner) -> list[PotentialLayout]:
+        """
+        Return every layout of every room that has a seat for each student.
+        """
+        n = len(self.c.get_roster())
+        layouts = list(layout for room in self.c.rooms for layout in room.layouts if layout.get_n_seats() >= n)
+        if not layouts:
+            raise ValueError(f'No layout has the {n} seats this class needs')
+        return layouts
+
     def get_layout(self: SeatingPlanner) -> PotentialLayout:
         """
-        @TODO Temporary means of getting the single layout prévu at this point.
+        Return the first layout that fits the class, for callers that plan on one layout.
         """
-        return self.c.rooms[0].layouts[0]
+        return self.get_layouts()[0]
 
-    def make_plan(self: SeatingPlanner) -> SeatingPlan:
-        layout = self.get_layout()
-        seats = list(layout.get_seats())
-        random.shuffle(seats)
+    def make_problem(self: SeatingPlanner, layout: PotentialLayout, students: list[Student]=None) -> solver.Problem:
+        """
+        Compile the constraints for a layout. students, if given, is who to seat instead of
+        the whole class; the problem numbers them by their place in that list.
+        """
+        students = self.c.get_roster() if students is None else students
+        neighbours, seats = layout.get_neighbours(self.adjacency), layout.get_seat_list()
+        with instrument.stage('problem'):
+            problem = solver.Problem(len(students), neighbours)
+            for constraint in self.constraints:
+                constraint.add_to(problem, students, seats)
+        return problem
 
-        layout = layout.make_blank_layout()
+    def get_cache_key(self: SeatingPlanner, seed: int, kwargs: dict) -> tuple:
+        """
+        Return everything a plan depends on: roster, layouts, constraints, solver settings and seed.
+        """
+        return (
+            self.c.get_fingerprint(),
+            tuple(layout.get_fingerprint() for layout in self.get_layouts()),
+            tuple(constraint.get_key() for constraint in self.constraints),
+            self.solver, self.adjacency, Constraint.freeze(kwargs), seed,
+        )
 
-        for (s, (row, col)) in zip(self.c.students, seats):
-            layout[row][col] = s
+    def make_plan(self: SeatingPlanner, seed: int=None, **kwargs) -> SeatingPlan:
+        """
+        Solve for a plan on every layout that fits and return the best-scoring one.
+        Layouts are solved in parallel if the planner has workers. Extra keyword arguments go to the solver.
+
+        Each layout gets its own RNG stream spawned from seed (a fresh one if not given),
+        and the plan remembers the seed, so it can always be made again. The exception is
+        a time_limit for the anneal solver: that is shared out between layouts solved one
+        after another, and a wall-clock budget is not reproducible.
+        """
+        if seed is None:
+            seed = solver.make_seed()
+
+        if self.cache is not None:
+            key = self.get_cache_key(seed, kwargs)
+            plan = self.cache.get(key)
+            if plan is not None:
+                instrument.count('cache.hits')
+                return plan
+            instrument.count('cache.misses')
+
+        layouts = self.get_layouts()
+        problems = list(self.make_problem(layout) for layout in layouts)
+        seeds = solver.spawn_seeds(seed, len(layouts))
+
+        parallel = self.executor is not None or (self.workers and len(layouts) > 1)
+        if kwargs.get('time_limit') and not parallel:
+            kwargs = dict(kwargs, time_limit=kwargs['time_limit'] / len(layouts))
+
+        with instrument.stage('solve'):
+            if self.executor is not None:
+                results = list(self.executor.map(solver.solve, [self.solver] * len(layouts), problems, seeds, [kwargs] * len(layouts)))
+            elif parallel:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(min(self.workers, len(layouts))) as pool:
+                    results = list(pool.map(solver.solve, [self.solver] * len(layouts), problems, seeds, [kwargs] * len(layouts)))
+            else:
+                results = list(solver.solve(self.solver, problem, seed, kwargs) for (problem, seed) in zip(problems, seeds))
+        instrument.count('plans')
+
+        # min keeps the first layout on a tie
+        i = min(range(len(layouts)), key=lambda i: results[i][1])
+        occupant, score, lower_bound = results[i]
+        plan = self.make_seating_plan(layouts[i], occupant, score, lower_bound, seed)
+
+        if self.cache is not None:
+            self.cache.put(key, plan)
+        return plan
+
+    def iter_plans(self: SeatingPlanner, seed: int=None, time_limit: float=None, stop: Callable[[], bool]=None, **kwargs) -> Iterator[SeatingPlan]:
+        """
+        Anneal every layout in turn, yielding a plan each time one beats every plan so far,
+        so the caller always holds the best found and can stop whenever it likes.
+
+        time_limit, if given, is shared equally between the layouts; stop, if given, is polled
+        while annealing and ends the search as soon as it returns true. Extra keyword
+        arguments go to solver.iter_anneal.
+        """
+        if seed is None:
+            seed = solver.make_seed()
+
+        layouts = self.get_layouts()
+        seeds = solver.spawn_seeds(seed, len(layouts))
+        if time_limit:
+            time_limit /= len(layouts)
+
+        best_score = math.inf
+        for (layout, layout_seed) in zip(layouts, seeds):
+            problem = self.make_problem(layout)
+            for (occupant, score) in solver.iter_anneal(problem, random.Random(layout_seed), time_limit=time_limit, stop=stop, **kwargs):
+                if score < best_score - 1e-9:
+                    best_score = score
+                    yield self.make_seating_plan(layout, occupant, problem.score(occupant), seed=seed)
+            if best_score <= 0 or (stop is not None and stop()):
+                return
+
+    def make_exam(self: SeatingPlanner, seed: int=None, capacities: list[int]=None, **kwargs) -> list[SeatingPlan|None]:
+        """
+        Seat the class across all of its rooms at once, as for an exam hall, and return one
+        plan per room (None for a room nobody was sent to).
+
+        Students are first shared out between the rooms, spreading every clique as thinly as
+        the rooms allow (see solver.partition); each room is then solved on its own, on the
+        best of its layouts, in parallel if the planner has workers. So tables are only ever
+        as big as one room. capacities, if given, has one entry per room and caps each room
+        below the seat count of its largest layout. Big rooms get solver.ITERATIONS_PER_SEAT
+        anneal swaps per seat unless iterations is given. Extra keyword arguments go to the solver.
+        """
+        if seed is None:
+            seed = solver.make_seed()
+
+        rooms = self.c.rooms
+        limits = list(max(layout.get_n_seats() for layout in room.layouts) for room in rooms)
+        if capacities is not None:
+            if len(capacities) != len(rooms):
+                raise ValueError(f'Got {len(capacities)} capacities for {len(rooms)} rooms')
+            limits = list(min(limit, cap) for (limit, cap) in zip(limits, capacities))
+
+        *room_seeds, partition_seed = solver.spawn_seeds(seed, len(rooms) + 1)
+        roster = self.c.get_roster()
+        with instrument.stage('partition'):
+            bins = solver.partition(list(s.clique for s in roster), limits, random.Random(partition_seed))
+
+        jobs = []
+        for (r, (room, ids)) in enumerate(zip(rooms, bins)):
+            if not ids:
+                continue
+            students = list(roster[i] for i in ids)
+            layouts = list(layout for layout in room.layouts if layout.get_n_seats() >= len(students))
+            for (layout, layout_seed) in zip(layouts, solver.spawn_seeds(room_seeds[r], len(layouts))):
+                job_kwargs = dict(kwargs)
+                job_kwargs.setdefault('iterations', max(solver.DEFAULT_ITERATIONS, solver.ITERATIONS_PER_SEAT * layout.get_n_seats()))
+                jobs.append((r, layout, students, layout_seed, job_kwargs))
+
+        # Problems are made as they are solved, so serially only one room's tables exist at a time
+        problems = (self.make_problem(layout, students) for (_, layout, students, _, _) in jobs)
+        args = (
+            [self.solver] * len(jobs), problems,
+            list(job_seed for (_, _, _, job_seed, _) in jobs), list(job_kwargs for (_, _, _, _, job_kwargs) in jobs),
+        )
+
+        with instrument.stage('solve'):
+            if self.workers and len(jobs) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(min(self.workers, len(jobs))) as pool:
+                    results = list(pool.map(solver.solve, *args))
+            else:
+                results = list(map(solver.solve, *args))
+
+        plans = [None] * len(rooms)
+        for ((r, layout, students, _, _), (occupant, score, lower_bound)) in zip(jobs, results):
+            # Within a room, the first layout wins a tie
+            if plans[r] is None or score < plans[r].score:
+                plans[r] = self.make_seating_plan(layout, occupant, score, lower_bound, seed, students)
+        return plans
+
+    def iter_distinct_plans(self: SeatingPlanner, max_score: float=HARD_WEIGHT) -> Iterator[SeatingPlan]:
+        """
+        Lazily yield every genuinely different plan on each layout that fits in turn: plans
+        that are mirror images, front-to-back flips or desk swaps of one another (where the
+        constraints cannot tell them apart) come out once. By default plans breaking a hard
+        constraint are cut off early. Only for small rooms: a room of n seats has up to n! plans.
+        """
+        for layout in self.get_layouts():
+            problem = self.make_problem(layout)
+            for (occupant, score) in solver.enumerate_distinct(problem, max_score):
+                yield self.make_seating_plan(layout, occupant, score)
+
+    def rank_distinct_plans(self: SeatingPlanner, k: int=None, max_score: float=HARD_WEIGHT) -> list[SeatingPlan]:
+        """
+        Return the k best genuinely different plans across every layout that fits (all of
+        them if k is None), best first.
+        """
+        layouts = self.get_layouts()
+        plans = (
+            (score, l, occupant)
+            for (l, layout) in enumerate(layouts)
+            for (occupant, score) in solver.enumerate_distinct(self.make_problem(layout), max_score)
+        )
+        # Ties go to the earlier layout, then the earlier plan
+        key = itemgetter(0, 1)
+        best = sorted(plans, key=key) if k is None else heapq.nsmallest(k, plans, key=key)
+        return list(self.make_seating_plan(layouts[l], occupant, score) for (score, l, occupant) in best)
+
+    def make_plans(self: SeatingPlanner, n: int, seed: int=None, k: int=1) -> list[SeatingPlan]:
+        """
+        Draw n random candidate plans on each layout that fits, score them all against the
+        planner's constraints and return the k best, best first. Each layout gets its own
+        RNG stream spawned from seed, and each plan remembers the seed (a fresh one if not
+        given), so the batch can be drawn again.
+        """
+        if seed is None:
+            seed = solver.make_seed()
+
+        layouts = self.get_layouts()
+        candidates = []
+        with instrument.stage('solve'):
+            for (l, layout_seed) in enumerate(solver.spawn_seeds(seed, len(layouts))):
+                best = solver.sample_best(self.make_problem(layouts[l]), random.Random(layout_seed), n, k)
+                # Ties go to the earlier layout, then the earlier candidate
+                candidates.extend((score, l, i, occupant) for (i, (occupant, score)) in enumerate(best))
+
+        best = heapq.nsmallest(k, candidates, key=itemgetter(0, 1, 2))
+        return list(self.make_seating_plan(layouts[l], occupant, score, seed=seed) for (score, l, _, occupant) in best)
+
+    def make_term(self: SeatingPlanner, k: int, seed: int=None, **kwargs) -> list[SeatingPlan]:
+        """
+        Plan k arrangements for a term at once, keeping repeated neighbours to a minimum.
+        The whole term stays on one layout: each layout that fits is planned and the one
+        with the lowest total score is kept, the first on a tie. Extra keyword arguments go
+        to solver.plan_term. Like make_plans, every plan remembers the seed, drawn fresh if
+        not given.
+        """
+        if seed is None:
+            seed = solver.make_seed()
+
+        layouts = self.get_layouts()
+        best, best_total = None, math.inf
+        with instrument.stage('solve'):
+            for (layout, layout_seed) in zip(layouts, solver.spawn_seeds(seed, len(layouts))):
+                plans = solver.plan_term(self.make_problem(layout), random.Random(layout_seed), k, **kwargs)
+                total = sum(score for (_, score) in plans)
+                if best is None or total < best_total:
+                    best, best_total = (layout, plans), total
+
+        layout, plans = best
+        return list(self.make_seating_plan(layout, occupant, score, seed=seed) for (occupant, score) in plans)
+
+    def get_repeat_counts(self: SeatingPlanner, plans: list[SeatingPlan]) -> dict[frozenset[Student], int]:
+        """
+        Return how many of the plans sat each pair of neighbours (by the planner's adjacency) together.
+        """
+        counts = {}
+        for plan in plans:
+            neighbours = plan.potential.get_neighbours(self.adjacency)
+            for (seat, i) in enumerate(plan.assignment):
+                if i == SeatingPlan.EMPTY:
+                    continue
+                for other in neighbours[seat]:
+                    j = plan.assignment[other]
+                    if other > seat and j != SeatingPlan.EMPTY:
+                        pair = frozenset({self.c.students[i], self.c.students[j]})
+                        counts[pair] = counts.get(pair, 0) + 1
+        return counts
+
+    def make_seating_plan(self: SeatingPlanner, layout: PotentialLayout, occupant: list[int], score: float, lower_bound: float=None, seed: int=None,
+                          students: list[Student]=None, absent: frozenset[int]=frozenset(), disabled: frozenset[int]=frozenset()) -> SeatingPlan:
+        """
+        Turn a solver's seat-to-student assignment into a SeatingPlan. students is the list
+        the problem was made from, if not the whole class.
+        """
+        if students is None:
+            students = self.c.get_roster()
+        empty = len(students)
+        if students is self.c.students:
+            assignment = array('h', (SeatingPlan.EMPTY if i == empty else i for i in occupant))
+        else:
+            assignment = array('h', (SeatingPlan.EMPTY if i == empty else students[i].id for i in occupant))
+        return SeatingPlan(self.c, layout, assignment, score, lower_bound, seed, absent, disabled)
+
+    def repair_plan(self: SeatingPlanner, plan: SeatingPlan, added: Iterable[Student]=(), left: Iterable[Student]=(),
+                    absent: Iterable[Student]=(), returned: Iterable[Student]=(), disabled: Iterable[tuple[int, int]]=(),
+                    enabled: Iterable[tuple[int, int]]=(), seed: int=None, **kwargs) -> SeatingPlan:
+        """
+        Patch a plan of this planner's class after a small change, moving as few students as possible.
+
+        added students join the class, and left students leave it: they are dropped from
+        the roster (their ids stay valid), so later plans leave them out too. absent students
+        are only away; they stay on the roster but out of this plan and every repair of it,
+        until they are passed as returned. Likewise disabled is (row, col) seats that must be
+        left empty from now on, until passed as enabled. Everyone else starts where the plan
+        had them, and only the seats around a change are searched; see solver.repair, which
+        gets any extra keyword arguments. The old plan is left as it was.
+        """
+        if seed is None:
+            seed = solver.make_seed()
+
+        for s in added:
+            self.c.add_student(s)
+        for s in left:
+            self.c.remove_student(s)
+
+        absent = (plan.absent | set(self.c.ids[s.name] for s in absent)) - set(self.c.ids[s.name] for s in returned) - self.c.left
+        students = list(s for s in self.c.get_roster() if s.id not in absent)
+
+        layout = plan.potential
+        index = layout.get_index()
+        enabled = set(index.get_seat(row, col) for (row, col) in enabled)
+        disabled = (plan.disabled | set(index.get_seat(row, col) for (row, col) in disabled)) - enabled - {-1}
+        if len(students) > index.n_seats - len(disabled):
+            raise ValueError(f'{len(students)} students do not fit in the {index.n_seats - len(disabled)} seats left')
+
+        problem = self.make_problem(layout, students)
+        for seat in disabled:
+            for i in range(len(students)):
+                problem.add_unary(i, seat, HARD_WEIGHT)
+
+        position = {s.id: i for (i, s) in enumerate(students)}
+        occupant, home = [problem.empty] * index.n_seats, [-1] * len(students)
+        affected = set((disabled - plan.disabled) | (enabled & plan.disabled))
+        for (seat, sid) in enumerate(plan.assignment):
+            i = position.get(sid)
+            if i is None:
+                # Someone left this seat
+                if sid != SeatingPlan.EMPTY:
+                    affected.add(seat)
+                continue
+            home[i] = seat
+            if seat not in disabled:
+                occupant[seat] = i
+
+        with instrument.stage('repair'):
+            occupant, score, _ = solver.repair(problem, random.Random(seed), occupant, home, affected, **kwargs)
+        return self.make_seating_plan(layout, occupant, score, seed=seed, students=students, absent=frozenset(absent), disabled=frozenset(disabled))
 
-        return SeatingPlan(self.c, layout)
-    
     def make_class_from_file(self: SeatingPlanner):
-        path = Utilities.choose_names_file()
-        self.c = SeatingPlanner.parse_data(path)
+        self.path = Utilities.choose_names_file()
+        self.c = SeatingPlanner.parse_data(self.path)
         self.name_length = Utilities.get_longest_length(s.name for s in self.c.students)
 
+    def open_history(self: SeatingPlanner):
+        """
+        Open the class's history store and steer new plans away from recent neighbours.
+        """
+        self.history = HistoryStore.for_class(self.path.stem, self.adjacency)
+        self.constraints.append(AvoidRecentPairs(self.history))
+        self.solver = 'anneal'
+
     @staticmethod
     def run():
         sp = SeatingPlanner()
         sp.make_class_from_file()
+        sp.open_history()
 
         choice = ''
         while choice != 'Q':
+            stopped = False
+
+            def stop() -> bool:
+                nonlocal stopped
+                stopped = stopped or Utilities.key_pressed()
+                return stopped
+
+            # Redraw as the plan improves, but not so often that the terminal flickers
+            drawn = 0.0
+            for plan in sp.iter_plans(time_limit=RUN_TIME_LIMIT, stop=stop):
+                if time.perf_counter() - drawn >= RUN_REFRESH:
+                    Utilities.clear_terminal()
+                    print(plan)
+                    print(f'Score {plan.score:g}; improving, press Enter to stop')
+                    drawn = time.perf_counter()
+
             Utilities.clear_terminal()
-            print(sp.make_plan())
-            choice = input('Enter to rerun or Q to quit: ').upper().strip()
+            print(plan)
+            print(f'Score {plan.score:g}')
+            choice = input('Enter to rerun, A to accept or Q to quit: ').upper().strip()
+
+            if choice == 'A':
+                sp.history.record(plan)
+                choice = 'Q'
+
+        sp.history.close()
+
+    @staticmethod
+    def get_class_seed(seed: int, path: Path) -> int:
+        """
+        Derive a class's own seed from the batch seed and its file stem, so that a class
+        gets the same plan whichever worker or order it runs in.
+        """
+        digest = hashlib.sha256(f'{seed}:{path.stem}'.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big')
+
+    @staticmethod
+    def plan_class(path: Path, seed: int, solver: str, n_candidates: int, record: bool) -> tuple[SeatingPlan, int]:
+        """
+        Plan one class file non-interactively. Return the plan and how many candidate plans were generated.
+        """
+        sp = SeatingPlanner(solver=solver)
+        sp.path = path
+        sp.c = SeatingPlanner.parse_data(path)
+        if record:
+            sp.open_history()
+            sp.solver = solver
+
+        if solver == 'random':
+            (plan,) = sp.make_plans(n_candidates, seed=seed)
+            n_candidates *= len(sp.get_layouts())
+        else:
+            n_candidates = 1
+            plan = sp.make_plan(seed)
+
+        if record:
+            sp.history.record(plan)
+            sp.history.close()
+
+        return plan, n_candidates
+
+    @staticmethod
+    def plan_class_file(path: Path, seed: int, out_dir: Path, solver: str, n_candidates: int, record: bool, fmt: str) -> tuple[str, int]:
+        """
+        Plan one class file and write the plan beside the others.
+        Return the class stem and how many candidate plans were generated.
+        """
+        plan, n_candidates = SeatingPlanner.plan_class(path, seed, solver, n_candidates, record)
+        with open(out_dir / (path.stem + render.RENDERERS[fmt].extension), 'w', encoding='utf-8', newline='') as f:
+            f.write(plan.render(fmt))
+        return path.stem, n_candidates
+
+    @staticmethod
+    def run_once(name: str, seed: int=None, solver: str='random', n_candidates: int=1, record: bool=False, fmt: str='text'):
+        """
+        Plan one class, named as in src/names or by path, and print the plan: no prompts,
+        no screen clearing and no process pool, so scripts and cron jobs can call it cheaply.
+        """
+        path = Path(name)
+        if not path.is_file():
+            path = PATH_CLASSES / f'{name}.txt'
+        if not path.is_file():
+            raise FileNotFoundError(f'No class named {name} in {PATH_CLASSES}')
+
+        plan, _ = SeatingPlanner.plan_class(path, seed, solver, n_candidates, record)
+        sys.stdout.write(plan.render(fmt))
+        sys.stdout.write('\n')
+
+    @staticmethod
+    def run_batch(target: str, out_dir: Path, seed: int=0, workers: int=None, solver: str='random', n_candidates: int=1, record: bool=False, fmt: str='text'):
+        """
+        Plan every class file matched by target (a directory or a glob) across a process pool.
+        """
+        paths = Utilities.expand_class_paths(target)
+        if not paths:
+            raise FileNotFoundError(f'No class files match {target}')
+
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        start = time.perf_counter()
+        n_plans = 0
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with instrument.stage('batch'), ProcessPoolExecutor(workers) as pool:
+            futures = {
+                pool.submit(SeatingPlanner.plan_class_file, path, SeatingPlanner.get_class_seed(seed, path), out_dir, solver, n_candidates, record, fmt): path
+                for path in paths
+            }
+            for future in as_completed(futures):
+                stem, n = future.result()
+                n_plans += n
+                instrument.count('classes')
+                print(f'{stem} -> {out_dir / (stem + render.RENDERERS[fmt].extension)}')
+        elapsed = time.perf_counter() - start
+
+        print()
+        print(f'{len(paths)} classes, {n_plans} plans in {elapsed:.2f} seconds')
+        print(f'{len(paths) / elapsed:.1f} classes/sec | {n_plans / elapsed:.1f} plans/sec')
+
+    @staticmethod
+    def run_exam(path: Path, out_dir: Path, seed: int=0, workers: int=None, solver: str='anneal', fmt: str='text'):
+        """
+        Seat one class file across all of its rooms, keeping cliques apart, and write one plan per room.
+        """
+        sp = SeatingPlanner([SeparateCliques()], solver=solver, workers=workers)
+        sp.path = Path(path)
+        sp.c = SeatingPlanner.parse_data(sp.path)
+
+        start = time.perf_counter()
+        plans = sp.make_exam(seed)
+        elapsed = time.perf_counter() - start
+
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for (i, plan) in enumerate(plans, 1):
+            if plan is None:
+                continue
+            out_path = out_dir / f'{sp.path.stem}-room{i}{render.RENDERERS[fmt].extension}'
+            with open(out_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(plan.render(fmt))
+            print(f'Room {i}: {len(plan.assignment) - plan.assignment.count(SeatingPlan.EMPTY)} students, score {plan.score:g} -> {out_path}')
+
+        print()
+        print(f'{len(sp.c.students)} students in {sum(1 for plan in plans if plan)} rooms in {elapsed:.2f} seconds')
+
+    @staticmethod
+    def main(argv: list[str]=None):
+        parser = argparse.ArgumentParser(description='Make seating plans. With no arguments, plan one class interactively.')
+        parser.add_argument('--batch', metavar='DIR_OR_GLOB', help='plan every class file in a directory or matching a glob')
+        parser.add_argument('--class', dest='class_name', metavar='NAME', help='plan one class (a name in src/names or a path) and print it, without prompting')
+        parser.add_argument('--exam', type=Path, metavar='PATH', help='seat one class file across all of its rooms, keeping cliques apart')
+        parser.add_argument('--out', type=Path, default=PATH_PLANS, help=f'where batch and exam plans are written (default {PATH_PLANS})')
+        parser.add_argument('--seed', type=int, default=None, help='seed; each class in a batch derives its own from this (default 0, or a fresh one with --class)')
+        parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+        parser.add_argument('--solver', choices=sorted(solver.SOLVERS), default=None, help='default random for batches, anneal for exams')
+        parser.add_argument('--candidates', type=int, default=1, help='random plans to draw per layout of each class, keeping the best')
+        parser.add_argument('--record', action='store_true', help="avoid recent pairs and record each plan in the class's history")
+        parser.add_argument('--format', choices=sorted(render.RENDERERS), default='text', help='output format for --class, --batch and --exam (default text)')
+        parser.add_argument('--profile', type=Path, default=instrument.get_env_path(), metavar='PATH',
+                            help=f'append stage timings, counters and peak memory to PATH, as Prometheus text if it ends .prom, else JSON lines (or set {instrument.ENV_VAR})')
+        args = parser.parse_args(argv)
+
+        recorder = instrument.Recorder() if args.profile else None
+        try:
+            with recorder or nullcontext():
+                seed = 0 if args.seed is None else args.seed
+                if args.class_name:
+                    SeatingPlanner.run_once(args.class_name, args.seed, args.solver or 'random', args.candidates, args.record, args.format)
+                elif args.exam:
+                    SeatingPlanner.run_exam(args.exam, args.out, seed, args.workers, args.solver or 'anneal', args.format)
+                elif args.batch:
+                    SeatingPlanner.run_batch(args.batch, args.out, seed, args.workers, args.solver or 'random', args.candidates, args.record, args.format)
+                else:
+                    SeatingPlanner.run()
+        except (FileNotFoundError, ValueError) as e:
+            # A missing class or a malformed class file (classfile.ParseError) is the user's to fix, not a crash
+            parser.exit(1, f'{parser.prog}: error: {e}\n')
+        finally:
+            if recorder:
+                recorder.dump(args.profile)
 
 class Utilities:
 
@@ -242,7 +1460,26 @@ class Utilities:
 
     @staticmethod
     def clear_terminal():
-        os.system('cls' if os.name == 'nt' else 'clear')
+        # Home the cursor and erase the screen, rather than starting a shell to run clear
+        sys.stdout.write('\033[H\033[2J')
+        sys.stdout.flush()
+
+    @staticmethod
+    def key_pressed() -> bool:
+        """
+        Return whether a key (Enter, outside Windows) is waiting on stdin, consuming it, without blocking.
+        """
+        if os.name == 'nt':
+            import msvcrt
+            if msvcrt.kbhit():
+                msvcrt.getwch()
+                return True
+            return False
+
+        ready, _, _ = select.select([sys.stdin], [], [], 0)
+        if ready:
+            sys.stdin.readline()
+        return bool(ready)
 
     @staticmethod
     def format_now() -> str:
@@ -252,6 +1489,16 @@ class Utilities:
         d = now.strftime('%d').lstrip('0')
         return now.strftime('%A, %B [], %Y').replace('[]', d)
 
+    @staticmethod
+    def expand_class_paths(target: str) -> list[Path]:
+        """
+        Return the class files in a directory, or those matching a glob, in sorted order.
+        """
+        path = Path(target)
+        if path.is_dir():
+            return sorted(path.glob('*.txt'))
+        return sorted(Path(p) for p in glob.glob(target))
+
     @staticmethod
     def choose_names_file() -> Path:
         choices = {}
@@ -261,7 +1508,7 @@ class Utilities:
             choices[path.stem] = path
         
         if len(choices) == 1:
-            return list(choices.values()[0])
+            return list(choices.values())[0]
         
         else:
             print('Choose names file: ')
@@ -275,4 +1522,4 @@ class Utilities:
             return choices[sorted(choices, reverse=True)[n - 1]]
 
 if __name__ == '__main__':
-    SeatingPlanner.run()
+    SeatingPlanner.main()
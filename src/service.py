@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import re
+
+import render
+import seating
+import solver
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Parsed classes kept warm, and finished plans kept for repeat requests
+DEFAULT_MAX_CLASSES = 64
+DEFAULT_MAX_PLANS = 1024
+
+# Request bodies beyond this are refused rather than read
+MAX_BODY = 1024 * 1024
+
+CLASS_NAME = re.compile(r'[\w\- ]+')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# JSON types of the constraint arguments that are not lists of students
+ARGUMENT_TYPES = {
+    'weight': (int, float),
+    'hard': (bool,),
+    'n_rows': (int,),
+}
+
+CONSTRAINTS = {
+    'SeparateCliques': seating.SeparateCliques,
+    'NoSameGenderNeighbours': seating.NoSameGenderNeighbours,
+    'FrontSeats': seating.FrontSeats,
+    'DistanceFromBoard': seating.DistanceFromBoard,
+    'AvoidPairs': seating.AvoidPairs,
+}
+
+class RequestError(Exception):
+    status: int
+
+    def __init__(self: RequestError, status: int, message: str):
+        self.status = status
+        super().__init__(message)
+
+class ClassCache:
+    """
+    Least-recently-used store of parsed classes by file path. A class is parsed again
+    only when its file's mtime or size changes; its layouts keep their seat indexes
+    between requests, so a warm class plans without parsing or indexing.
+    """
+    max_entries: int
+
+    def __init__(self: ClassCache, max_entries: int=DEFAULT_MAX_CLASSES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def get_stamp(path: Path) -> tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def load(path: Path) -> seating.Class:
+        """
+        Parse a class and build its layouts' indexes, ready to be cached.
+        """
+        c = seating.SeatingPlanner.parse_data(path)
+        for room in c.rooms:
+            for layout in room.layouts:
+                layout.get_index()
+        return c
+
+    def get(self: ClassCache, path: Path, stamp: tuple[int, int]) -> seating.Class|None:
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != stamp:
+            return None
+        self.entries.move_to_end(path)
+        return entry[1]
+
+    def put(self: ClassCache, path: Path, stamp: tuple[int, int], c: seating.Class):
+        self.entries[path] = (stamp, c)
+        self.entries.move_to_end(path)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+class PlanningService:
+    """
+    Plans classes from src/names on request over HTTP/JSON.
+
+        GET  /classes  the class names available
+        POST /plan     {"class": name, "seed": int, "solver": name, "adjacency": kind,
+                        "constraints": [{"type": name, ...arguments}], "format": name}
+
+    Constraint arguments are those of the Constraint's constructor, with students
+    given by name. A plan comes back as its placements, plus the rendered plan if a
+    format is asked for. Parsing and scoring happen on a thread pool and solving on a
+    process pool, so the event loop only ever moves bytes.
+    """
+    classes: ClassCache
+    plans: seating.PlanCache
+
+    def __init__(self: PlanningService, workers: int=None, max_classes: int=DEFAULT_MAX_CLASSES, max_plans: int=DEFAULT_MAX_PLANS):
+        self.classes = ClassCache(max_classes)
+        self.plans = seating.PlanCache(max_plans)
+        self.processes = ProcessPoolExecutor(workers)
+        self.threads = ThreadPoolExecutor()
+
+    def close(self: PlanningService):
+        self.threads.shutdown()
+        self.processes.shutdown()
+
+    async def handle(self: PlanningService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve one connection, answering requests on it until the client closes it.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while (line := await reader.readline()).strip():
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                keep_alive = headers.get('connection', '').lower() != 'close' and version.strip() == 'HTTP/1.1'
+
+                if length > MAX_BODY:
+                    status, body = 413, {'error': f'Bodies are limited to {MAX_BODY} bytes'}
+                    keep_alive = False
+                else:
+                    status, body = await self.dispatch(method, target, await reader.readexactly(length))
+
+                data = json.dumps(body).encode('utf-8')
+                writer.write((
+                    f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                    f'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+                ).encode('latin-1') + data)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self: PlanningService, method: str, target: str, body: bytes) -> tuple[int, object]:
+        try:
+            if target == '/classes':
+                if method != 'GET':
+                    raise RequestError(405, 'Use GET /classes')
+                return 200, {'classes': sorted(path.stem for path in seating.PATH_CLASSES.glob('*.txt'))}
+
+            if target == '/plan':
+                if method != 'POST':
+                    raise RequestError(405, 'Use POST /plan')
+                try:
+                    request = json.loads(body or b'{}')
+                except ValueError as e:
+                    raise RequestError(400, f'Body is not JSON: {e}')
+                if not isinstance(request, dict):
+                    raise RequestError(400, 'Body must be a JSON object')
+                return 200, await self.plan(request)
+
+            raise RequestError(404, f'No such endpoint {target}')
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+    async def plan(self: PlanningService, request: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        name = request.get('class')
+        if not isinstance(name, str) or not CLASS_NAME.fullmatch(name):
+            raise RequestError(400, 'class must be the name of a class file in src/names')
+
+        path = seating.PATH_CLASSES / f'{name}.txt'
+        if not path.exists():
+            raise RequestError(404, f'No class named {name}')
+
+        try:
+            # Parsing runs on a thread, but the caches are only touched here on the loop's thread
+            stamp = ClassCache.get_stamp(path)
+            c = self.classes.get(path, stamp)
+            if c is None:
+                c = await loop.run_in_executor(self.threads, ClassCache.load, path)
+                self.classes.put(path, stamp, c)
+            sp = self.make_planner(c, request)
+        except (ValueError, TypeError, KeyError) as e:
+            raise RequestError(400, str(e))
+
+        seed = request.get('seed')
+        if seed is None:
+            seed = solver.make_seed()
+        if not isinstance(seed, int):
+            raise RequestError(400, 'seed must be an integer')
+
+        key = sp.get_cache_key(seed, {})
+        plan = self.plans.get(key)
+        if plan is None:
+            try:
+                plan = await loop.run_in_executor(self.threads, sp.make_plan, seed)
+            except ValueError as e:
+                raise RequestError(400, str(e))
+            self.plans.put(key, plan)
+
+        response = {
+            'class': name,
+            'seed': plan.seed,
+            'fingerprint': plan.fingerprint,
+            'score': plan.score,
+            'lower_bound': plan.lower_bound,
+            'placements': list({'row': row, 'col': col, 'name': s.name} for (row, col, s) in plan.get_placements()),
+        }
+
+        fmt = request.get('format')
+        if fmt is not None:
+            if fmt not in render.RENDERERS:
+                raise RequestError(400, f'format must be one of {", ".join(sorted(render.RENDERERS))}')
+            response['rendered'] = await loop.run_in_executor(self.threads, plan.render, fmt)
+
+        return response
+
+    def make_planner(self: PlanningService, c: seating.Class, request: dict) -> seating.SeatingPlanner:
+        name = request.get('solver', 'anneal')
+        if name not in solver.SOLVERS:
+            raise ValueError(f'solver must be one of {", ".join(sorted(solver.SOLVERS))}')
+
+        adjacency = request.get('adjacency', 'orthogonal')
+        if not isinstance(adjacency, str) or not all(kind in seating.SeatIndex.ADJACENCY_KINDS for kind in adjacency.split('+')):
+            raise ValueError(f'adjacency must be one of {", ".join(seating.SeatIndex.ADJACENCY_KINDS)}, or several joined with +')
+
+        constraints = list(self.make_constraint(c, spec) for spec in request.get('constraints', []))
+        sp = seating.SeatingPlanner(constraints, name, adjacency, executor=self.processes)
+        sp.c = c
+        return sp
+
+    @staticmethod
+    def make_constraint(c: seating.Class, spec: dict) -> seating.Constraint:
+        """
+        Build a Constraint from its JSON form, looking students up by name.
+        """
+        if not isinstance(spec, dict):
+            raise ValueError('Each constraint must be an object with a type')
+
+        args = dict(spec)
+        kind = args.pop('type', None)
+        if kind not in CONSTRAINTS:
+            raise ValueError(f'Constraint type must be one of {", ".join(CONSTRAINTS)}')
+
+        def student(name: object) -> seating.Student:
+            if not isinstance(name, str) or name not in c.ids:
+                raise ValueError(f'No student named {name}')
+            return c.students[c.ids[name]]
+
+        def as_list(val: object, arg: str) -> list:
+            if not isinstance(val, list):
+                raise ValueError(f'{arg} must be a list')
+            return val
+
+        for (arg, val) in args.items():
+            types = ARGUMENT_TYPES.get(arg)
+            # JSON true is an int to Python, so only a bool will do where one is expected
+            if types is not None and (not isinstance(val, types) or (isinstance(val, bool) and bool not in types)):
+                raise ValueError(f'{arg} must be {" or ".join(t.__name__ for t in types)}')
+
+        if args.get('students') is not None:
+            args['students'] = list(map(student, as_list(args['students'], 'students')))
+        if 'pairs' in args:
+            args['pairs'] = list(list(map(student, as_list(pair, 'each pair'))) for pair in as_list(args['pairs'], 'pairs'))
+        if args.get('cliques') is not None:
+            if not all(isinstance(clique, str) for clique in as_list(args['cliques'], 'cliques')):
+                raise ValueError('cliques must be a list of clique names')
+
+        return CONSTRAINTS[kind](**args)
+
+async def serve(host: str=DEFAULT_HOST, port: int=DEFAULT_PORT, workers: int=None, max_classes: int=DEFAULT_MAX_CLASSES):
+    service = PlanningService(workers, max_classes)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f'Serving seating plans on http://{host}:{port}')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv: list[str]=None):
+    parser = argparse.ArgumentParser(description='Serve seating plans over HTTP/JSON, keeping classes warm between requests.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help='solver processes (default: one per CPU)')
+    parser.add_argument('--max-classes', type=int, default=DEFAULT_MAX_CLASSES, help=f'parsed classes to keep in memory (default {DEFAULT_MAX_CLASSES})')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_classes))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,853 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from operator import add, itemgetter
+import hashlib
+import heapq
+import math
+import random
+import sys
+import time
+
+import instrument
+
+# Annealing schedule defaults, tuned so a 35-seat room settles well inside 100 ms
+DEFAULT_ITERATIONS = 12000
+DEFAULT_T_START = 2.0
+DEFAULT_T_END = 0.02
+
+# Branch-and-bound nodes to expand before settling for the best plan so far
+DEFAULT_NODE_LIMIT = 2000
+
+# Penalty per repeated neighbour pair when planning a term of plans
+DEFAULT_REPEAT_WEIGHT = 10.0
+
+# Annealing swaps per seat when a room is too big for the default budget
+ITERATIONS_PER_SEAT = 100
+
+# Most seat symmetries to collect before enumerating with the ones found so far
+AUTOMORPHISM_LIMIT = 5040
+
+# Cost of moving one student off their old seat when repairing a plan, and how many
+# swaps a repair may score before it settles
+DEFAULT_MOVE_WEIGHT = 0.5
+DEFAULT_REPAIR_BUDGET = 20000
+
+def spawn_seeds(seed: int, n: int) -> list[int]:
+    """
+    Return n independent child seeds derived from one parent seed, in the spirit of
+    NumPy's SeedSequence.spawn: child i is the same however many siblings it has.
+    """
+    return list(
+        int.from_bytes(hashlib.sha256(f'{seed}/{i}'.encode('ascii')).digest()[:8], 'big')
+        for i in range(n)
+    )
+
+def make_seed() -> int:
+    """
+    Return a fresh 64-bit seed from the OS, for runs that were not given one.
+    """
+    return random.SystemRandom().getrandbits(64)
+
+class Problem:
+    """
+    A seat assignment problem compiled down to plain cost tables.
+
+    Students are 0 .. n_students - 1 and the extra index n_students stands for an empty
+    seat, which costs nothing anywhere. An assignment is a list giving the occupant of
+    each seat. Costs are never negative, so a score of 0 is optimal.
+
+    Tables stay O(seats + edges) however big the room. unary rows are one shared row of
+    zeros until a student is given a cost, and pair costs are kept per student only where
+    they are set. Groups, which charge for every pair of neighbours within a group, are
+    not expanded into pairs: each student has a kind, standing for the labels it has
+    been given, and kind_cost holds the cost between two kinds. Kind 0 is no group at
+    all. Past KIND_LIMIT kinds, further groups are kept as plain label lists instead.
+    """
+    NO_GROUP = -1
+    KIND_LIMIT = 128
+
+    n_students: int
+    n_seats: int
+    neighbours: list[list[int]]
+    unary: list[list[float]]
+    pair: list[dict[int, float]]
+    kind: list[int]
+    kind_cost: list[list[float]]
+    groups: list[tuple[list[int], float]]
+
+    def __init__(self: Problem, n_students: int, neighbours: list[list[int]]):
+        self.n_students, self.n_seats = n_students, len(neighbours)
+        self.neighbours = neighbours
+
+        if n_students > self.n_seats:
+            raise ValueError(f'{n_students} students do not fit in {self.n_seats} seats')
+
+        self._zeros = [0.0] * self.n_seats
+        self.unary = [self._zeros] * (n_students + 1)
+        self.pair = list({} for _ in range(n_students + 1))
+        self.kind, self.kind_cost = [0] * (n_students + 1), [[0.0]]
+        self.groups = []
+
+    @property
+    def empty(self: Problem) -> int:
+        return self.n_students
+
+    def add_unary(self: Problem, student: int, seat: int, cost: float):
+        row = self.unary[student]
+        if row is self._zeros:
+            row = self.unary[student] = row[:]
+        row[seat] += cost
+
+    def add_pair(self: Problem, a: int, b: int, cost: float):
+        if a != b:
+            self.pair[a][b] = self.pair[a].get(b, 0.0) + cost
+            self.pair[b][a] = self.pair[b].get(a, 0.0) + cost
+
+    def add_groups(self: Problem, groups: Iterable[list[int]], cost: float):
+        """
+        Charge cost for every pair of neighbours within one of the given disjoint groups of students.
+        """
+        labels = [Problem.NO_GROUP] * (self.n_students + 1)
+        for (g, group) in enumerate(groups):
+            for x in group:
+                labels[x] = g
+
+        # A kind is now an old kind together with a label
+        kinds = {(0, Problem.NO_GROUP): 0}
+        kind = [kinds.setdefault(key, len(kinds)) for key in zip(self.kind, labels)]
+        if len(kinds) > Problem.KIND_LIMIT:
+            self.groups.append((labels, cost))
+            return
+
+        old_kinds = list(k for (k, _) in kinds)
+        kind_cost = list(list(map(self.kind_cost[k].__getitem__, old_kinds)) for k in old_kinds)
+        members = {}
+        for (i, (_, label)) in enumerate(kinds):
+            if label != Problem.NO_GROUP:
+                members.setdefault(label, []).append(i)
+        for group in members.values():
+            for i in group:
+                row = kind_cost[i]
+                for j in group:
+                    row[j] += cost
+        self.kind, self.kind_cost = kind, kind_cost
+
+    def get_pair(self: Problem, x: int, y: int) -> float:
+        """
+        Return the cost of students x and y sitting side by side.
+        """
+        if x == y:
+            return 0.0
+        cost = self.kind_cost[self.kind[x]][self.kind[y]] + self.pair[x].get(y, 0.0)
+        for (labels, group_cost) in self.groups:
+            if labels[x] != Problem.NO_GROUP and labels[x] == labels[y]:
+                cost += group_cost
+        return cost
+
+    def get_pair_table(self: Problem) -> list[list[float]]:
+        """
+        Return every pair cost as a dense (n_students + 1)^2 table, for the solvers that
+        only suit small rooms anyway.
+        """
+        m = self.n_students + 1
+        return list(list(self.get_pair(x, y) for y in range(m)) for x in range(m))
+
+    def has_pairs(self: Problem) -> bool:
+        return len(self.kind_cost) > 1 or bool(self.groups) or any(self.pair)
+
+    def score(self: Problem, occupant: list[int]) -> float:
+        """
+        Return the full cost of an assignment, counting each neighbouring pair once.
+        """
+        total = 0.0
+        unary, neighbours, pair = self.unary, self.neighbours, self.pair
+        kinds = list(map(self.kind.__getitem__, occupant))
+        kind_cost = self.kind_cost
+        for (seat, x) in enumerate(occupant):
+            total += unary[x][seat]
+            row = kind_cost[kinds[seat]]
+            for other in neighbours[seat]:
+                if other > seat:
+                    total += row[kinds[other]]
+
+        if any(pair):
+            for (seat, x) in enumerate(occupant):
+                px = pair[x]
+                if px:
+                    for other in neighbours[seat]:
+                        if other > seat:
+                            total += px.get(occupant[other], 0.0)
+
+        for (labels, cost) in self.groups:
+            for (seat, x) in enumerate(occupant):
+                label = labels[x]
+                if label != Problem.NO_GROUP:
+                    for other in neighbours[seat]:
+                        if other > seat and labels[occupant[other]] == label:
+                            total += cost
+        return total
+
+    def delta(self: Problem, occupant: list[int], a: int, b: int) -> float:
+        """
+        Return the change in cost from swapping the occupants of seats a and b,
+        touching only the two seats' own neighbourhoods.
+        """
+        x, y = occupant[a], occupant[b]
+        unary = self.unary
+        d = unary[y][a] + unary[x][b] - unary[x][a] - unary[y][b]
+
+        kind = self.kind
+        kx, ky = self.kind_cost[kind[x]], self.kind_cost[kind[y]]
+        for n in self.neighbours[a]:
+            if n != b:
+                k = kind[occupant[n]]
+                d += ky[k] - kx[k]
+        for n in self.neighbours[b]:
+            if n != a:
+                k = kind[occupant[n]]
+                d += kx[k] - ky[k]
+
+        px, py = self.pair[x], self.pair[y]
+        if px or py:
+            for n in self.neighbours[a]:
+                if n != b:
+                    o = occupant[n]
+                    d += py.get(o, 0.0) - px.get(o, 0.0)
+            for n in self.neighbours[b]:
+                if n != a:
+                    o = occupant[n]
+                    d += px.get(o, 0.0) - py.get(o, 0.0)
+
+        for (labels, cost) in self.groups:
+            lx, ly = labels[x], labels[y]
+            # Swapping two students with the same label changes nothing, and NO_GROUP matches nobody
+            if lx != ly:
+                for n in self.neighbours[a]:
+                    if n != b:
+                        lo = labels[occupant[n]]
+                        if lo != Problem.NO_GROUP:
+                            d += cost * ((lo == ly) - (lo == lx))
+                for n in self.neighbours[b]:
+                    if n != a:
+                        lo = labels[occupant[n]]
+                        if lo != Problem.NO_GROUP:
+                            d += cost * ((lo == lx) - (lo == ly))
+
+        return d
+
+    def make_random(self: Problem, rng: random.Random) -> list[int]:
+        occupant = list(range(self.n_students)) + [self.empty] * (self.n_seats - self.n_students)
+        rng.shuffle(occupant)
+        return occupant
+
+def solve_random(problem: Problem, rng: random.Random, **kwargs) -> tuple[list[int], float, float|None]:
+    """
+    The original behaviour: a uniform shuffle, scored but not improved.
+
+    Every solver returns (assignment, score, lower bound), where the lower bound is a
+    proven floor on the best possible score, or None if the solver cannot give one.
+    """
+    occupant = problem.make_random(rng)
+    return occupant, problem.score(occupant), None
+
+def iter_anneal(problem: Problem, rng: random.Random, iterations: int=None, t_start: float=DEFAULT_T_START, t_end: float=DEFAULT_T_END,
+                time_limit: float=None, stop: Callable[[], bool]=None, **kwargs) -> Iterator[tuple[list[int], float]]:
+    """
+    Simulated annealing over seat swaps, scoring each swap by its delta only. Yields
+    (assignment, score) for the starting shuffle and then for every improvement on it,
+    so the caller holds the best plan so far at any moment and may stop whenever it likes.
+    Scores are running sums of deltas, so may be off by float rounding.
+
+    The run ends after iterations swaps or time_limit seconds, whichever comes first, or
+    as soon as stop() returns true; with neither budget it runs DEFAULT_ITERATIONS swaps.
+    The temperature follows whichever budget is further spent.
+    """
+    if iterations is None:
+        iterations = DEFAULT_ITERATIONS if time_limit is None else sys.maxsize
+
+    occupant = problem.make_random(rng)
+    score = problem.score(occupant)
+    best_score = score
+    yield occupant[:], score
+
+    n_seats, empty = problem.n_seats, problem.empty
+    if n_seats < 2 or best_score <= 0:
+        return
+
+    ratio = t_end / t_start
+    cooling = ratio ** (1 / iterations)
+    t = t_start
+    randrange, uniform, exp = rng.randrange, rng.random, math.exp
+    delta = problem.delta
+    n_iterations, n_accepted = 0, 0
+
+    checked = time_limit is not None or stop is not None
+    start = time.perf_counter()
+
+    for n_iterations in range(1, iterations + 1):
+        t *= cooling
+
+        # Reading the clock every swap would cost more than the swap
+        if checked and not n_iterations & 255:
+            if stop is not None and stop():
+                break
+            if time_limit is not None:
+                progress = max(n_iterations / iterations, (time.perf_counter() - start) / time_limit)
+                if progress >= 1:
+                    break
+                t = t_start * ratio ** progress
+
+        a, b = randrange(n_seats), randrange(n_seats)
+        if a == b or (occupant[a] == empty and occupant[b] == empty):
+            continue
+
+        d = delta(occupant, a, b)
+        if d <= 0 or uniform() < exp(-d / t):
+            occupant[a], occupant[b] = occupant[b], occupant[a]
+            score += d
+            n_accepted += 1
+
+            if score < best_score - 1e-9:
+                best_score = score
+                yield occupant[:], best_score
+                if best_score <= 0:
+                    break
+
+    instrument.count('anneal.iterations', n_iterations)
+    instrument.count('anneal.swaps_accepted', n_accepted)
+
+def solve_anneal(problem: Problem, rng: random.Random, **kwargs) -> tuple[list[int], float, float|None]:
+    """
+    Run iter_anneal to the end of its budget and return the best plan it found.
+    """
+    for (best, _) in iter_anneal(problem, rng, **kwargs):
+        pass
+
+    # Re-score from scratch so float drift from the running deltas never reaches the caller
+    return best, problem.score(best), None
+
+def _make_getter(items: list[int]) -> Callable[[list], tuple]:
+    """
+    Return an itemgetter that always yields a tuple, even for a single index.
+    """
+    if len(items) == 1:
+        (i,) = items
+        return lambda seq: (seq[i],)
+    return itemgetter(*items)
+
+def sample_best(problem: Problem, rng: random.Random, n: int, k: int=1) -> list[tuple[list[int], float]]:
+    """
+    Draw n uniform assignments and return the k lowest-cost ones, best first.
+
+    The cost tables are flattened once and each candidate is scored with a handful of
+    C-level map/sum passes over the seat and edge lists, so no per-seat Python loop runs
+    per candidate. Only the current top k are kept in memory.
+    """
+    n_seats, m = problem.n_seats, problem.n_students + 1
+    edges = list((a, b) for a in range(n_seats) for b in problem.neighbours[a] if b > a)
+
+    has_pair = bool(edges) and problem.has_pairs()
+    flat_pair = list(c for row in problem.get_pair_table() for c in row) if has_pair else []
+    if has_pair:
+        get_a, get_b = _make_getter(list(a for (a, _) in edges)), _make_getter(list(b for (_, b) in edges))
+        pair_scale = list(x * m for x in range(m)).__getitem__
+
+    flat_unary = list(c for row in problem.unary for c in row)
+    has_unary = any(flat_unary)
+    unary_scale = list(x * n_seats for x in range(m)).__getitem__
+    seat_range = range(n_seats)
+
+    pair_cost, unary_cost = flat_pair.__getitem__, flat_unary.__getitem__
+
+    heap = []
+    occupant = list(range(problem.n_students)) + [problem.empty] * (n_seats - problem.n_students)
+    shuffle = rng.shuffle
+
+    for i in range(n):
+        shuffle(occupant)
+
+        score = 0.0
+        if has_pair:
+            score += sum(map(pair_cost, map(add, map(pair_scale, get_a(occupant)), get_b(occupant))))
+        if has_unary:
+            score += sum(map(unary_cost, map(add, map(unary_scale, occupant), seat_range)))
+
+        # Max-heap on score via negation; i breaks ties without comparing lists
+        if len(heap) < k:
+            heapq.heappush(heap, (-score, i, occupant[:]))
+        elif -score > heap[0][0]:
+            heapq.heapreplace(heap, (-score, i, occupant[:]))
+
+    instrument.count('sample.candidates', n)
+    return list((occ, -neg) for (neg, _, occ) in sorted(heap, reverse=True))
+
+def linear_sum_assignment(cost: list[list[float]]) -> list[int]:
+    """
+    Return the column for each row that minimises the total cost, for a rectangular
+    matrix with no more rows than columns. Hungarian algorithm with potentials, O(n^2 m).
+    """
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    if n > m:
+        raise ValueError(f'Cannot assign {n} rows to {m} columns')
+
+    inf = math.inf
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    columns = range(1, m + 1)
+
+    for i in range(1, n + 1):
+        p[0], j0 = i, 0
+        minv, used = [inf] * (m + 1), [False] * (m + 1)
+
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row, u_i0 = cost[i0 - 1], u[i0]
+            delta, j1 = inf, 0
+
+            for j in columns:
+                if not used[j]:
+                    cur = row[j - 1] - u_i0 - v[j]
+                    if cur < minv[j]:
+                        minv[j], way[j] = cur, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    column_of = [-1] * n
+    for j in columns:
+        if p[j]:
+            column_of[p[j] - 1] = j - 1
+    return column_of
+
+def _assign_unary(problem: Problem, students: list[int], seats: list[int]) -> tuple[list[int], float]:
+    """
+    Optimally seat the given students in the given seats by unary cost alone.
+    Return the chosen seat for each student and the total unary cost.
+    """
+    if not students:
+        return [], 0.0
+    unary = problem.unary
+    cost = list(list(unary[x][a] for a in seats) for x in students)
+    columns = linear_sum_assignment(cost)
+    return list(seats[j] for j in columns), sum(cost[i][j] for (i, j) in enumerate(columns))
+
+def solve_exact(problem: Problem, rng: random.Random, node_limit: int=DEFAULT_NODE_LIMIT, **kwargs) -> tuple[list[int], float, float|None]:
+    """
+    Minimum-cost assignment. With unary costs only this is a single linear-sum assignment
+    and is optimal. Otherwise students with pairwise costs are placed by best-first branch
+    and bound, with an annealed plan as the starting incumbent, and everyone else is
+    seated by linear-sum assignment at each leaf.
+
+    Bounds assume pairwise costs are non-negative, which holds for every Constraint.
+    If node_limit runs out, the returned lower bound shows how far from optimal the plan may be.
+    """
+    n, n_seats, empty = problem.n_students, problem.n_seats, problem.empty
+    pair, unary, neighbours = problem.get_pair_table(), problem.unary, problem.neighbours
+
+    # Root bound: everyone at their unary optimum, ignoring pairs
+    seats_of, root_bound = _assign_unary(problem, list(range(n)), list(range(n_seats)))
+
+    weights = list(sum(pair[x][:n]) for x in range(n))
+    paired = sorted((x for x in range(n) if weights[x]), key=lambda x: -weights[x])
+    unpaired = list(x for x in range(n) if not weights[x])
+
+    if not paired:
+        occupant = [empty] * n_seats
+        for (x, a) in enumerate(seats_of):
+            occupant[a] = x
+        return occupant, problem.score(occupant), root_bound
+
+    best, best_score, _ = solve_anneal(problem, rng)
+    if best_score <= root_bound + 1e-9:
+        return best, best_score, root_bound
+
+    # Nodes are (bound, cost so far, tiebreak, occupant); depth is how many of paired are placed
+    heap = [(root_bound, 0.0, 0, 0, tuple([empty] * n_seats))]
+    counter, n_nodes = 1, 0
+
+    while heap and n_nodes < node_limit:
+        bound, g, _, depth, occupant = heapq.heappop(heap)
+        if bound >= best_score - 1e-9:
+            continue
+        n_nodes += 1
+
+        free = list(a for a in range(n_seats) if occupant[a] == empty)
+
+        if depth == len(paired):
+            seats, cost = _assign_unary(problem, unpaired, free)
+            total = g + cost
+            if total < best_score - 1e-9:
+                leaf = list(occupant)
+                for (y, a) in zip(unpaired, seats):
+                    leaf[a] = y
+                best, best_score = leaf, total
+            continue
+
+        x = paired[depth]
+        rest = paired[depth + 1:] + unpaired
+        h = sum(min(unary[y][a] for a in free) for y in rest)
+        row, ux = pair[x], unary[x]
+
+        for a in free:
+            g_child = g + ux[a]
+            for b in neighbours[a]:
+                o = occupant[b]
+                if o != empty:
+                    g_child += row[o]
+
+            if g_child + h < best_score - 1e-9:
+                child = list(occupant)
+                child[a] = x
+                heapq.heappush(heap, (g_child + h, g_child, counter, depth + 1, tuple(child)))
+                counter += 1
+
+    instrument.count('exact.nodes', n_nodes)
+    if heap:
+        lower_bound = max(root_bound, min(best_score, heap[0][0]))
+    else:
+        lower_bound = best_score
+
+    return best, problem.score(best), lower_bound
+
+def get_pairs(problem: Problem, occupant: list[int]) -> Iterator[tuple[int, int]]:
+    """
+    Yield each pair of neighbouring students in an assignment once, smaller id first.
+    """
+    empty = problem.empty
+    for (a, x) in enumerate(occupant):
+        if x == empty:
+            continue
+        for b in problem.neighbours[a]:
+            y = occupant[b]
+            if b > a and y != empty:
+                yield (x, y) if x < y else (y, x)
+
+def get_round_robin(n: int) -> list[list[tuple[int, int]]]:
+    """
+    Return the n - 1 rounds (n rounded up to even) of the circle method: every pair of
+    0 .. n - 1 meets in exactly one round. Pairs with the stand-in n mean a bye.
+    """
+    m = n + (n % 2)
+    circle = list(range(m))
+    rounds = []
+    for _ in range(m - 1):
+        rounds.append(list((circle[i], circle[m - 1 - i]) for i in range(m // 2)))
+        circle = [circle[0], circle[-1]] + circle[1:-1]
+    return rounds
+
+def _place_round(problem: Problem, pairs: list[tuple[int, int]], rng: random.Random) -> list[int]|None:
+    """
+    Seat one round-robin round on a layout whose neighbours form desk pairs: each pair
+    shares a desk and anyone left over gets a seat with nobody beside them.
+    Return None if the room cannot keep everyone else apart.
+    """
+    n, empty = problem.n_students, problem.empty
+    desks = list((a, b) for a in range(problem.n_seats) for b in problem.neighbours[a] if b > a)
+    singles = list(a for a in range(problem.n_seats) if not problem.neighbours[a])
+    rng.shuffle(desks)
+    rng.shuffle(singles)
+
+    pairs = list((x, y) for (x, y) in pairs if x < n and y < n)
+    paired = set(x for pair in pairs for x in pair)
+    alone = list(x for x in range(n) if x not in paired)
+    rng.shuffle(pairs)
+
+    occupant = [empty] * problem.n_seats
+    for ((x, y), (a, b)) in zip(pairs, desks):
+        occupant[a], occupant[b] = x, y
+
+    # Pairs that missed out on a desk split up, as does anyone with a bye
+    alone += list(x for pair in pairs[len(desks):] for x in pair)
+    spare = singles + list(a for (a, _) in desks[len(pairs):])
+    if len(alone) > len(spare):
+        return None
+
+    for (x, a) in zip(alone, spare):
+        occupant[a] = x
+    return occupant
+
+def plan_term(problem: Problem, rng: random.Random, k: int, repeat_weight: float=DEFAULT_REPEAT_WEIGHT, **kwargs) -> list[tuple[list[int], float]]:
+    """
+    Plan k assignments in sequence so that neighbours repeat as little as possible,
+    returning each with its score against the problem's own costs.
+
+    When the neighbours are plain desk pairs and nothing else is being optimised, the
+    rounds of a round-robin tournament give up to n - 1 plans with no pair repeated.
+    Otherwise each plan is annealed against the problem plus a repeat penalty that
+    grows with the square of a pair's count, which also keeps the maximum count down.
+    """
+    n = problem.n_students
+    is_desks = all(len(others) <= 1 for others in problem.neighbours)
+    is_free = not any(any(row) for row in problem.unary) and not problem.has_pairs()
+
+    # With nobody to pair up there are no rounds, and annealing seats nobody just as well
+    if is_desks and is_free and n >= 2:
+        order = list(range(n))
+        rng.shuffle(order)
+        rounds = get_round_robin(n)
+        rng.shuffle(rounds)
+
+        plans = []
+        for i in range(k):
+            pairs = list((order[x] if x < n else n, order[y] if y < n else n) for (x, y) in rounds[i % len(rounds)])
+            occupant = _place_round(problem, pairs, rng)
+            if occupant is None:
+                break
+            plans.append((occupant, problem.score(occupant)))
+        else:
+            return plans
+
+    working = Problem(n, problem.neighbours)
+    working.unary = problem.unary
+    working.pair = list(dict(row) for row in problem.pair)
+    working.kind, working.kind_cost, working.groups = problem.kind, problem.kind_cost, problem.groups
+    counts = {}
+
+    plans = []
+    for _ in range(k):
+        occupant, _, _ = solve_anneal(working, rng, **kwargs)
+        plans.append((occupant, problem.score(occupant)))
+
+        # Going from c to c + 1 repeats adds (c + 1)^2 - c^2 = 2c + 1 to the penalty
+        for pair in get_pairs(problem, occupant):
+            c = counts.get(pair, 0)
+            counts[pair] = c + 1
+            working.add_pair(*pair, repeat_weight * (2 * c + 1))
+
+    return plans
+
+def repair(problem: Problem, rng: random.Random, occupant: list[int], home: list[int], affected: Iterable[int],
+           move_weight: float=DEFAULT_MOVE_WEIGHT, budget: int=DEFAULT_REPAIR_BUDGET, **kwargs) -> tuple[list[int], float, float|None]:
+    """
+    Patch an assignment after a small change instead of solving from scratch.
+
+    occupant may leave some students out (new arrivals, or students whose seat went away);
+    each is first put in whichever empty seat costs least. home gives every student's seat
+    before the change (-1 for none), and leaving it costs move_weight, so a student only
+    moves when that pays for itself. Local search then starts from the affected seats and
+    their neighbours: each seat on the worklist tries its best swap with any other seat, and
+    only the two seats of a swap taken (and their neighbours) are queued again. It stops
+    when the worklist empties or budget swaps have been scored.
+    """
+    occupant = occupant[:]
+    n_seats, empty = problem.n_seats, problem.empty
+    neighbours, unary, get_pair = problem.neighbours, problem.unary, problem.get_pair
+    home = list(home) + [-1] * (problem.n_students + 1 - len(home))
+    home[empty] = -1
+
+    def moved(x: int, seat: int) -> float:
+        return move_weight if home[x] not in (-1, seat) else 0.0
+
+    queue = sorted(set(affected))
+    rng.shuffle(queue)
+
+    placed = set(occupant)
+    for x in range(problem.n_students):
+        if x in placed:
+            continue
+
+        best, best_cost = -1, math.inf
+        for seat in range(n_seats):
+            if occupant[seat] == empty:
+                cost = unary[x][seat] + sum(get_pair(x, occupant[n]) for n in neighbours[seat])
+                if cost < best_cost:
+                    best, best_cost = seat, cost
+        occupant[best] = x
+        queue.append(best)
+
+    pending = set(queue)
+    for seat in list(queue):
+        for n in neighbours[seat]:
+            if n not in pending:
+                pending.add(n)
+                queue.append(n)
+
+    delta = problem.delta
+    n_scored, n_accepted = 0, 0
+    while queue and budget > 0:
+        a = queue.pop()
+        pending.discard(a)
+        x = occupant[a]
+
+        best, best_d = -1, -1e-9
+        for b in range(n_seats):
+            y = occupant[b]
+            if b == a or (x == empty and y == empty):
+                continue
+            d = delta(occupant, a, b) + moved(x, b) + moved(y, a) - moved(x, a) - moved(y, b)
+            if d < best_d:
+                best, best_d = b, d
+        budget -= n_seats
+        n_scored += n_seats
+
+        if best != -1:
+            n_accepted += 1
+            occupant[a], occupant[best] = occupant[best], occupant[a]
+            for seat in (a, best, *neighbours[a], *neighbours[best]):
+                if seat not in pending:
+                    pending.add(seat)
+                    queue.append(seat)
+
+    instrument.count('repair.swaps_scored', n_scored)
+    instrument.count('repair.swaps_accepted', n_accepted)
+    return occupant, problem.score(occupant), None
+
+def partition(groups: list[Hashable], capacities: list[int], rng: random.Random) -> list[list[int]]:
+    """
+    Share items 0 .. n - 1 out between bins of the given capacities, spreading the members
+    of each group as thinly as the capacities allow, and return the items in each bin.
+
+    Groups are dealt largest first, each item going to the bin where its group is the
+    smallest share of the capacity, then to the least full bin. Items whose group is
+    falsy belong to no group and fill in last. O(n * bins).
+    """
+    if len(groups) > sum(capacities):
+        raise ValueError(f'{len(groups)} students do not fit in {sum(capacities)} seats')
+
+    members = {}
+    for (i, g) in enumerate(groups):
+        members.setdefault(g or None, []).append(i)
+    loose = members.pop(None, [])
+
+    bins = list([] for _ in capacities)
+    loads = [0] * len(capacities)
+    open_bins = list(b for (b, cap) in enumerate(capacities) if cap > 0)
+
+    for group in sorted(members.values(), key=len, reverse=True) + [loose]:
+        rng.shuffle(group)
+        counts = [0] * len(capacities)
+        spread = group is not loose
+
+        for i in group:
+            b = min(open_bins, key=lambda b: ((counts[b] / capacities[b]) if spread else 0, loads[b] / capacities[b]))
+            bins[b].append(i)
+            counts[b] += 1
+            loads[b] += 1
+            if loads[b] == capacities[b]:
+                open_bins.remove(b)
+
+    return bins
+
+def get_automorphisms(problem: Problem, limit: int=AUTOMORPHISM_LIMIT) -> list[tuple[int, ...]]:
+    """
+    Return the permutations of seats that map the problem onto itself: neighbours stay
+    neighbours and every student's cost for a seat is the same at its image. Mirror
+    images, front-to-back flips and interchangeable desks all show up here if the
+    layout and constraints allow them. Each is a tuple giving the image of every seat.
+
+    Seats are matched in order by backtracking, only ever to seats with the same degree
+    and costs. Stops after limit symmetries, which then need not form a whole group.
+    """
+    n = problem.n_seats
+    adjacent = list(set(others) for others in problem.neighbours)
+    signatures = list((len(adjacent[a]), tuple(row[a] for row in problem.unary)) for a in range(n))
+
+    found = []
+    image, used = [-1] * n, [False] * n
+
+    def extend(a: int):
+        if a == n:
+            found.append(tuple(image))
+            return
+        for b in range(n):
+            if used[b] or signatures[b] != signatures[a]:
+                continue
+            if all((c in adjacent[a]) == (image[c] in adjacent[b]) for c in range(a)):
+                image[a], used[b] = b, True
+                extend(a + 1)
+                used[b] = False
+                if len(found) >= limit:
+                    return
+
+    extend(0)
+    return found
+
+def enumerate_distinct(problem: Problem, max_score: float=math.inf, symmetries: list[tuple[int, ...]]=None) -> Iterator[tuple[list[int], float]]:
+    """
+    Lazily yield (assignment, score) for every assignment that differs from all others
+    by more than a symmetry of the layout, in lexicographic order by seat.
+
+    An assignment is yielded only if it is the lexicographically least of its images
+    under symmetries (by default get_automorphisms), so each orbit gives exactly one.
+    Partial assignments are cut as soon as a symmetry maps them below themselves, or
+    their cost reaches max_score; like solve_exact, this assumes costs are non-negative.
+    """
+    if symmetries is None:
+        symmetries = get_automorphisms(problem)
+    identity = tuple(range(problem.n_seats))
+    symmetries = list(g for g in symmetries if g != identity)
+
+    n_seats, empty = problem.n_seats, problem.empty
+    unary, pair, neighbours = problem.unary, problem.get_pair_table(), problem.neighbours
+    earlier = list(tuple(b for b in neighbours[a] if b < a) for a in range(n_seats))
+
+    occupant = [-1] * n_seats
+    left = [1] * problem.n_students + [n_seats - problem.n_students]
+
+    def is_least(k: int) -> bool:
+        # Compare each image with the assignment up to the first seat either leaves open
+        for g in symmetries:
+            for a in range(k):
+                b = g[a]
+                if b >= k:
+                    break
+                if occupant[b] != occupant[a]:
+                    if occupant[b] < occupant[a]:
+                        return False
+                    break
+        return True
+
+    def extend(k: int, cost: float) -> Iterator[tuple[list[int], float]]:
+        if k == n_seats:
+            yield occupant[:], cost
+            return
+
+        for x in range(empty + 1):
+            if not left[x]:
+                continue
+
+            c = cost + unary[x][k]
+            row = pair[x]
+            for b in earlier[k]:
+                c += row[occupant[b]]
+            if c >= max_score:
+                continue
+
+            occupant[k] = x
+            left[x] -= 1
+            if is_least(k + 1):
+                yield from extend(k + 1, c)
+            left[x] += 1
+        occupant[k] = -1
+
+    yield from extend(0, 0.0)
+
+SOLVERS = {
+    'random': solve_random,
+    'anneal': solve_anneal,
+    'exact': solve_exact,
+}
+
+def solve(name: str, problem: Problem, seed: int|None, kwargs: dict) -> tuple[list[int], float, float|None]:
+    """
+    Run a named solver with its own seeded RNG. A plain function, so worker processes can run it.
+    """
+    return SOLVERS[name](problem, random.Random(seed), **kwargs)
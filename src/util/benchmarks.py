@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+import argparse
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import seating
+
+# Timings are saved as multiples of reference_work()'s time on the same machine, so a
+# baseline saved on one machine still means something on another
+PATH_BASELINE = Path(__file__).resolve().parent / 'benchmarks_baseline.json'
+
+# A case is slower than its baseline if it takes this much longer
+TOLERANCE = 0.25
+
+# Each timing is the best of this many rounds, each at least this long
+N_ROUNDS = 5
+MIN_ROUND = 0.02
+
+def make_rect_grid(n_students: int, n_rows: int, n_cols: int, trim: bool=True) -> list[str]:
+    """
+    Return grid rows of desk pairs (1 1 0 1 1 0 ...), trimmed to the rows needed unless
+    trim is false, for timing a class in a room far bigger than it.
+    """
+    row = ''.join('0' if (i % 3) == 2 else '1' for i in range(n_cols))
+    per_row = row.count('1')
+    if trim:
+        n_rows = min(n_rows, max(1, math.ceil(n_students / per_row)))
+    return [row] * n_rows
+
+def make_semicircle_grid(n_students: int) -> list[str]:
+    """
+    Return grid rows for the semicircle in src/notes/arrangement.txt, as GeometricLayout
+    lays it out: an arc open towards the front with a gap between the halves at the back.
+    """
+    return list(''.join('1' if c else '0' for c in row) for row in seating.GeometricLayout.semicircle(n_students).grid)
+
+def make_class_text(n_students: int, grid: list[str], rng: random.Random) -> str:
+    lines = ['names::']
+    for i in range(n_students):
+        lines.append(f'Student{i:03}:{rng.choice("MFC")}:{rng.choice(["", "a", "b", "c", "d"])}')
+    lines.append('')
+    lines.append('grid::')
+    lines.extend(' '.join(row) for row in grid)
+    return '\n'.join(lines) + '\n'
+
+CASES = {
+    'rect-10': lambda n: make_rect_grid(n, 4, 6),
+    'rect-30': lambda n: make_rect_grid(n, 6, 9),
+    'rect-100': lambda n: make_rect_grid(n, 12, 15),
+    'rect-500': lambda n: make_rect_grid(n, 50, 50, trim=False),
+    'semicircle-30': make_semicircle_grid,
+    'semicircle-100': make_semicircle_grid,
+}
+
+def get_n_calls(f: Callable[[], object]) -> int:
+    """
+    Return how many calls of f make a round of at least MIN_ROUND, as timeit's autorange does.
+    """
+    n_calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(n_calls):
+            f()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_ROUND:
+            return n_calls
+        n_calls *= 2 if elapsed * 10 >= MIN_ROUND else 10
+
+def best_time(f: Callable[[], object], n_rounds: int=N_ROUNDS) -> tuple[float, float]:
+    """
+    Return the best per-call time of f over n_rounds rounds, and the best time of
+    reference_work() over rounds interleaved with them, so both see the same machine.
+    Calls too quick to time on their own are repeated for a round of at least MIN_ROUND.
+    """
+    n_calls = get_n_calls(f)
+    best, reference = math.inf, math.inf
+    for _ in range(n_rounds):
+        start = time.perf_counter()
+        reference_work()
+        reference = min(reference, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(n_calls):
+            f()
+        best = min(best, (time.perf_counter() - start) / n_calls)
+    return best, reference
+
+def reference_work():
+    """
+    A fixed slice of the interpreter work the hot paths do (list and dict traffic, integer
+    arithmetic, sorting), timed as the yardstick the baseline is measured in.
+    """
+    rng = random.Random(0)
+    xs = list(range(20000))
+    rng.shuffle(xs)
+    xs.sort(key=lambda x: -x)
+    counts = {}
+    for x in xs:
+        counts[x % 97] = counts.get(x % 97, 0) + x * 3
+
+def run_case(name: str, folder: Path) -> dict[str, tuple[float, float]]:
+    """
+    Return each operation's best time and the reference time taken beside it.
+    """
+    n_students = int(name.rsplit('-', 1)[1])
+    rng = random.Random(n_students)
+
+    path = folder / f'{name}.txt'
+    path.write_text(make_class_text(n_students, CASES[name](n_students), rng), encoding='utf-8')
+
+    results = {}
+    results['parse'] = best_time(lambda: seating.SeatingPlanner.parse_data(path, use_cache=False))
+    seating.SeatingPlanner.parse_data(path)
+    results['parse-cached'] = best_time(lambda: seating.SeatingPlanner.parse_data(path))
+
+    sp = seating.SeatingPlanner([seating.SeparateCliques(), seating.NoSameGenderNeighbours()])
+    sp.c = seating.SeatingPlanner.parse_data(path)
+    layout = sp.get_layout()
+
+    def index_and_seats():
+        layout.grid = layout.grid
+        return layout.get_seats()
+
+    results['index+get_seats'] = best_time(index_and_seats)
+    results['get_seats'] = best_time(layout.get_seats)
+    results['make_problem'] = best_time(lambda: sp.make_problem(layout))
+
+    sp.solver = 'random'
+    results['make_plan-random'] = best_time(lambda: sp.make_plan(0))
+    sp.solver = 'anneal'
+    results['make_plan-anneal'] = best_time(lambda: sp.make_plan(0), 3)
+    results['make_plans-1000'] = best_time(lambda: sp.make_plans(1000, seed=0), 3)
+
+    plan = sp.make_plan(0)
+    problem = sp.make_problem(layout)
+    occupant = list(problem.empty if i == seating.SeatingPlan.EMPTY else i for i in plan.assignment)
+    results['score'] = best_time(lambda: problem.score(occupant))
+    results['str'] = best_time(lambda: str(plan))
+
+    return results
+
+def main(argv: list[str]=None):
+    parser = argparse.ArgumentParser(description='Time the parse, plan, score and render hot paths.')
+    parser.add_argument('cases', nargs='*', default=list(CASES), help=f'cases to run (default all: {", ".join(CASES)})')
+    parser.add_argument('--save', action='store_true', help=f'store these results, relative to the reference timing, as the baseline in {PATH_BASELINE.name}')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if PATH_BASELINE.exists():
+        baseline = json.loads(PATH_BASELINE.read_text(encoding='utf-8'))
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as folder:
+        for name in args.cases:
+            # The reference is timed beside each operation, so the machine's speed cancels out
+            times = run_case(name, Path(folder))
+            results[name] = {op: t / reference for (op, (t, reference)) in times.items()}
+
+            # A case that looks slower is timed again, and each operation keeps its better run
+            base_case = baseline.get(name, {})
+            if any(op in base_case and ratio > base_case[op] * (1 + TOLERANCE) for (op, ratio) in results[name].items()):
+                for (op, (t, reference)) in run_case(name, Path(folder)).items():
+                    if t / reference < results[name][op]:
+                        times[op], results[name][op] = (t, reference), t / reference
+
+            print(name)
+            for (op, (t, _)) in times.items():
+                line = f'  {op:<18} {t * 1000:>10.3f} ms'
+
+                base = base_case.get(op)
+                if base:
+                    change = (results[name][op] - base) / base
+                    line += f'  {change:+7.1%}'
+                    if change > TOLERANCE:
+                        line += '  REGRESSION'
+                        regressions.append(f'{name} {op}')
+                print(line)
+            print()
+
+    if args.save:
+        baseline.update(results)
+        PATH_BASELINE.write_text(json.dumps(baseline, indent=4, sort_keys=True) + '\n', encoding='utf-8')
+        print(f'Saved baseline to {PATH_BASELINE}')
+
+    if regressions:
+        print(f'{len(regressions)} regressions beyond {TOLERANCE:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
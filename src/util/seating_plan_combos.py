@@ -1,25 +1,102 @@
-from itertools import permutations as perms
+from pathlib import Path
+import sys
 import time
 import math
+import tempfile
 
-for N in range(2, 15):
-    start = time.time()
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import analytics
+import combos
+import seating
+import solver
 
-    base = set()
-    for i in range(1, N):
-        base.add(frozenset({i, i + 1}))
+N_DAYS = 60
 
-    n_repeats = 0
-    for p in perms(range(1, N + 1)):
-        for i in range(len(p) - 1):
-            if {p[i], p[i + 1]} in base:
-                n_repeats += 1
-                break
-    
-    end = time.time()
+ROOMS = {
+    '30 in 5 rows of desk pairs': (seating.PotentialLayout([[c != '0' for c in '11011011'] for _ in range(5)]), 'orthogonal'),
+    '30 in a semicircle': (seating.GeometricLayout.semicircle(30), 'distance'),
+    '29 in a tiered V': (seating.GeometricLayout.v_shape(29), 'distance'),
+}
 
-    pct = (n_repeats / math.perm(N)) * 100
+def report_lines():
+    """
+    How often a random line arrangement repeats a neighbour from the previous one, exactly.
+    """
+    for N in range(2, 41):
+        start = time.time()
 
-    print(f'N = {N:>2} | {end - start:.5f} seconds')
-    print(f'{n_repeats} / {math.perm(N)}'.ljust(30), ' | ', f'{pct:.2f}%'.ljust(6))
-    print()
+        base = combos.chain_pairs(N)
+        n_repeats = combos.count_repeats(N, base)
+
+        end = time.time()
+
+        pct = (n_repeats / math.perm(N)) * 100
+
+        print(f'N = {N:>2} | {end - start:.5f} seconds')
+        print(f'{n_repeats} / {math.perm(N)}'.ljust(30), ' | ', f'{pct:.2f}%'.ljust(6))
+        print()
+
+def report_rooms():
+    """
+    Same question for real rooms, where exact counting is out of reach.
+    """
+    for (name, (layout, kind)) in ROOMS.items():
+        n_students = min(30, layout.get_n_seats())
+
+        start = time.time()
+        estimate = combos.estimate_repeat_probability(layout.get_neighbours(kind), n_students, seed=0)
+        end = time.time()
+
+        print(f'{name} ({kind}) | {end - start:.2f} seconds')
+        print(f'{estimate.p * 100:.2f}% [{estimate.low * 100:.2f}%, {estimate.high * 100:.2f}%] from {estimate.n} plans')
+        print()
+
+def report_term():
+    """
+    What actually happens over a term of daily plans, shuffled or planned as a term.
+    """
+    layout, kind = ROOMS['30 in 5 rows of desk pairs']
+    names = '\n'.join(f'Student{i:02}' for i in range(30))
+    rows = '\n'.join(' '.join('1' if c else '0' for c in row) for row in layout.grid)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / 'term.txt'
+        path.write_text(f'names::\n{names}\n\ngrid::\n{rows}\n', encoding='utf-8')
+
+        sp = seating.SeatingPlanner(solver='random', adjacency=kind)
+        sp.c = seating.SeatingPlanner.parse_data(path, use_cache=False)
+
+        terms = {
+            'shuffled': list(sp.make_plan(day) for day in range(N_DAYS)),
+            'planned as a term': sp.make_term(N_DAYS, seed=0),
+        }
+
+    for (name, plans) in terms.items():
+        summary = analytics.PairReport(kind).add_all(plans).get_summary()
+        print(f'{N_DAYS} days {name}')
+        print(f'{summary["coverage"] * 100:.1f}% of pairs have sat together | max repeat {summary["max_repeat"]} | mean repeat {summary["mean_repeat"]:.2f}')
+        print()
+
+def report_distinct():
+    """
+    How many plans of a small room are genuinely different, once its symmetries are taken out.
+    """
+    for (name, grid) in {'2 rows of 2 desk pairs': [[c != '0' for c in '11011'] for _ in range(2)], '3 by 3': [[True] * 3 for _ in range(3)]}.items():
+        layout = seating.PotentialLayout(grid)
+        n = layout.get_n_seats()
+        problem = solver.Problem(n, layout.get_neighbours('orthogonal'))
+
+        start = time.time()
+        n_symmetries = len(solver.get_automorphisms(problem))
+        n_distinct = sum(1 for _ in solver.enumerate_distinct(problem))
+        end = time.time()
+
+        print(f'{name} | {end - start:.2f} seconds')
+        print(f'{n_distinct} distinct plans of {math.factorial(n)}, under {n_symmetries} symmetries')
+        print()
+
+if __name__ == '__main__':
+    report_lines()
+    report_rooms()
+    report_term()
+    report_distinct()
@@ -0,0 +1,71 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+import classfile
+
+GENDERS = ('M', 'F', 'C')
+
+def parse(text: str) -> classfile.ClassData:
+    return classfile.parse(text.splitlines(), genders=GENDERS, default_gender='C')
+
+def error_line(text: str) -> int:
+    with pytest.raises(classfile.ParseError) as e:
+        parse(text)
+    return e.value.line_no
+
+def test_students_and_grid():
+    data = parse('names::\nAda:F:x\nBo:M\nCy\n\ngrid::\n1 1 0\n0 1 1\n')
+    assert data.students == [('Ada', 'F', 'x'), ('Bo', 'M', ''), ('Cy', 'C', '')]
+    assert data.rooms == [[[(True, True, False), (False, True, True)]]]
+
+def test_clique_with_default_gender():
+    data = parse('names::\nAda::x\n\ngrid::\n1 1\n')
+    assert data.students == [('Ada', 'C', 'x')]
+
+def test_rooms():
+    data = parse('names::\nAda\n\nroom::\ngrid::\n1\ngrid::\n1 1\n\nroom::\ngrid::\n1 1 1\n')
+    assert list(len(room) for room in data.rooms) == [2, 1]
+    assert len(data.grids) == 3
+
+def test_text_after_header():
+    assert error_line('names:: Ada\n\ngrid::\n1\n') == 1
+
+def test_unknown_section():
+    assert error_line('names::\nAda\nseats::\n1\n') == 3
+
+def test_unknown_gender():
+    assert error_line('names::\nAda:Q\ngrid::\n1\n') == 2
+
+def test_duplicate_name():
+    assert error_line('names::\nAda\nAda\ngrid::\n1\n') == 3
+
+def test_ragged_grid():
+    assert error_line('names::\nAda\ngrid::\n1 1\n1\n') == 5
+
+def test_empty_grid():
+    assert error_line('names::\nAda\ngrid::\n0 0\nroom::\ngrid::\n1\n') == 3
+
+def test_room_without_grid():
+    assert error_line('names::\nAda\nroom::\ngrid::\n1\nroom::\n\n\n') == 6
+
+def test_no_grid():
+    with pytest.raises(classfile.ParseError):
+        parse('names::\nAda\n')
+
+def test_line_before_section():
+    assert error_line('Ada\nnames::\n') == 1
+
+def test_load_cache(tmp_path: Path):
+    path = tmp_path / 'c.txt'
+    path.write_text('names::\nAda::x\n\ngrid::\n1 1\n', encoding='utf-8')
+
+    data = classfile.load(path, GENDERS, 'C')
+    assert classfile.get_cache_path(path).exists()
+    cached = classfile.load(path, GENDERS, 'C')
+    assert (cached.students, cached.rooms) == (data.students, data.rooms)
+
+    path.write_text('names::\nAda::x\nBo\n\ngrid::\n1 1\n', encoding='utf-8')
+    assert len(classfile.load(path, GENDERS, 'C').students) == 2
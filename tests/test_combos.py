@@ -0,0 +1,64 @@
+from math import factorial
+from pathlib import Path
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+import combos
+
+# Counts up to this N are checked against the brute-force oracle
+ORACLE_MAX_N = 9
+
+@pytest.mark.parametrize('n', range(0, ORACLE_MAX_N + 1))
+def test_paths_match_oracle(n: int):
+    pairs = combos.chain_pairs(n)
+    assert combos.count_repeats(n, pairs) == combos.count_repeats_brute(n, pairs)
+
+@pytest.mark.parametrize('n', range(2, ORACLE_MAX_N + 1))
+def test_bitmask_matches_oracle(n: int):
+    # Random pairs are rarely disjoint paths, so this exercises the bitmask DP
+    rng = random.Random(n)
+    pairs = combos.normalise_pairs(rng.sample(range(n), 2) for _ in range(n))
+    assert combos.count_repeats(n, pairs) == combos.count_repeats_brute(n, pairs)
+
+def test_bitmask_on_cycle():
+    # A cycle is never a set of paths
+    pairs = combos.chain_pairs(6) | {frozenset({0, 5})}
+    assert combos._get_path_lengths(pairs) is None
+    assert combos.count_repeats(7, pairs) == combos.count_repeats_brute(7, pairs)
+
+@pytest.mark.parametrize('n', range(2, ORACLE_MAX_N + 1))
+def test_forests_match_oracle(n: int):
+    rng = random.Random(n)
+    pairs = combos.normalise_pairs(rng.sample(range(n), 2) for _ in range(2 * n))
+    assert factorial(n) - combos._count_avoiding_forests(n, pairs) == combos.count_repeats_brute(n, pairs)
+
+def test_forests_match_bitmask():
+    # A 3 by 4 grid, with diagonals, is neither paths nor sparse
+    grid = {(r, c): 4 * r + c for r in range(3) for c in range(4)}
+    pairs = {frozenset({i, grid[r + dr, c + dc]}) for ((r, c), i) in grid.items() for (dr, dc) in ((0, 1), (1, 0), (1, 1), (1, -1)) if (r + dr, c + dc) in grid}
+    assert combos._count_avoiding_forests(14, pairs) == combos._count_avoiding_bitmask(14, pairs)
+
+def test_orthogonal_room():
+    # 5 rows of desk pairs: orthogonal neighbours form a grid graph, too many students for the bitmask DP
+    seats = [(r, c) for r in range(5) for c in (0, 1, 3, 4, 6, 7)]
+    index = {seat: i for (i, seat) in enumerate(seats)}
+    pairs = {frozenset({i, index[r + dr, c + dc]}) for ((r, c), i) in index.items() for (dr, dc) in ((0, 1), (1, 0)) if (r + dr, c + dc) in index}
+    assert combos._get_path_lengths(pairs) is None
+    assert 0 < combos.repeat_probability(30, pairs) < 1
+
+def test_oracle_workers():
+    pairs = combos.chain_pairs(7)
+    assert combos.count_repeats_brute(7, pairs, workers=2) == combos.count_repeats_brute(7, pairs)
+
+def test_no_pairs():
+    assert combos.count_repeats(8, []) == 0
+    assert combos.count_repeats_brute(8, []) == 0
+
+def test_out_of_range():
+    with pytest.raises(ValueError):
+        combos.count_repeats(3, [(0, 3)])
+    with pytest.raises(ValueError):
+        combos.count_repeats_brute(3, [(0, 3)])
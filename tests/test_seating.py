@@ -0,0 +1,52 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+import seating
+
+def make_planner(n_students: int, n_rows: int, n_cols: int) -> seating.SeatingPlanner:
+    sp = seating.SeatingPlanner()
+    sp.c = seating.Class()
+    for i in range(n_students):
+        sp.c.add_student(seating.Student(f'S{i}', 'C', ''))
+    sp.c.rooms.append(seating.Classroom.from_grid([[True] * n_cols for _ in range(n_rows)]))
+    return sp
+
+def seated(plan: seating.SeatingPlan) -> set[str]:
+    return set(s.name for (_, _, s) in plan.get_placements())
+
+def test_repair_chain():
+    sp = make_planner(10, 3, 4)
+    students = sp.c.students
+    plan = sp.make_plan(seed=0)
+    assert seated(plan) == set(f'S{i}' for i in range(10))
+
+    # S1 is away today, and the seat at (0, 0) is broken
+    plan = sp.repair_plan(plan, absent=[students[1]], disabled=[(0, 0)], seed=1)
+    assert 'S1' not in seated(plan)
+    assert plan.assignment[0] == seating.SeatingPlan.EMPTY
+    assert plan.absent == {1} and plan.disabled == {0}
+
+    # S2 leaves for good; S1 is still away and the seat still broken
+    plan = sp.repair_plan(plan, left=[students[2]], seed=2)
+    assert seated(plan) == set(f'S{i}' for i in range(10)) - {'S1', 'S2'}
+    assert plan.assignment[0] == seating.SeatingPlan.EMPTY
+
+    # S1 comes back and a newcomer arrives, but S2 stays gone
+    plan = sp.repair_plan(plan, added=[seating.Student('S10', 'C', '')], returned=[students[1]], seed=3)
+    assert seated(plan) == set(f'S{i}' for i in range(11)) - {'S2'}
+    assert plan.absent == set() and plan.disabled == {0}
+    assert plan.assignment[0] == seating.SeatingPlan.EMPTY
+
+    # Once the seat is mended, a fresh plan has the whole class bar S2
+    plan = sp.repair_plan(plan, enabled=[(0, 0)], seed=4)
+    assert plan.disabled == set()
+    assert seated(sp.make_plan(seed=5)) == set(f'S{i}' for i in range(11)) - {'S2'}
+
+def test_rejoin_keeps_id():
+    sp = make_planner(4, 2, 2)
+    s = sp.c.students[3]
+    sp.c.remove_student(s)
+    assert len(sp.c.get_roster()) == 3
+    assert sp.c.add_student(seating.Student('S3', 'C', '')) == 3
+    assert sp.c.get_roster() == sp.c.students
@@ -0,0 +1,60 @@
+from pathlib import Path
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+import solver
+
+# Two desks of two seats each
+DESKS = [[1], [0], [3], [2]]
+
+@pytest.mark.parametrize('n', [0, 1])
+def test_plan_term_without_pairs(n: int):
+    plans = solver.plan_term(solver.Problem(n, DESKS), random.Random(0), 3)
+    assert len(plans) == 3
+    for (occupant, score) in plans:
+        assert sorted(i for i in occupant if i != n) == list(range(n))
+        assert score == 0
+
+def test_plan_term_round_robin():
+    problem = solver.Problem(4, DESKS)
+    plans = solver.plan_term(problem, random.Random(0), 3)
+    pairs = list(pair for (occupant, _) in plans for pair in solver.get_pairs(problem, occupant))
+    assert len(pairs) == len(set(pairs)) == 6
+
+def make_ring(n_seats: int) -> list[list[int]]:
+    return list([(a - 1) % n_seats, (a + 1) % n_seats] for a in range(n_seats))
+
+@pytest.mark.parametrize('kind_limit', [1, solver.Problem.KIND_LIMIT])
+def test_delta_matches_score(kind_limit: int, monkeypatch):
+    # A kind limit of 1 keeps every group as plain labels
+    monkeypatch.setattr(solver.Problem, 'KIND_LIMIT', kind_limit)
+    rng = random.Random(kind_limit)
+    problem = solver.Problem(9, make_ring(12))
+    problem.add_groups([[0, 1, 2], [3, 4]], 1.0)
+    problem.add_groups([[0, 3, 5, 7], [1, 6]], 2.0)
+    problem.add_pair(2, 8, 0.5)
+    problem.add_unary(4, 0, 3.0)
+
+    occupant = problem.make_random(rng)
+    for _ in range(200):
+        a, b = rng.sample(range(problem.n_seats), 2)
+        swapped = occupant[:]
+        swapped[a], swapped[b] = swapped[b], swapped[a]
+        assert problem.delta(occupant, a, b) == pytest.approx(problem.score(swapped) - problem.score(occupant))
+        occupant = swapped
+
+    table = problem.get_pair_table()
+    assert table[0][1] == 1.0 and table[0][3] == 2.0 and table[0][0] == 0.0 and table[2][8] == 0.5
+
+def test_groups_stay_sparse():
+    # A whole school in two groups stores labels, not a cost per pair
+    n = 2000
+    problem = solver.Problem(n, make_ring(n))
+    problem.add_groups([list(range(0, n, 2)), list(range(1, n, 2))], 1.0)
+    assert not any(problem.pair)
+    assert len(problem.kind_cost) == 3
+    assert len(set(map(id, problem.unary))) == 1
+    assert problem.score(list(range(n))) == 0